@@ -0,0 +1,228 @@
+# batch.py
+# ---------------
+"""
+This file contains the batch solver. It takes maze files from directories or
+glob patterns and solves them with one search method on a pool of worker
+processes, one per core by default. Results are yielded as soon as each maze
+is done. A maze that runs past the per-task timeout has its worker killed and
+replaced, so one slow maze cannot hold up the rest of the batch. Solved
+mazes can also be rendered to PNG files by the workers, with render.py.
+"""
+
+import io
+import os
+import glob
+import json
+import time
+import argparse
+import contextlib
+import multiprocessing
+from multiprocessing.connection import wait
+
+import render
+from maze import Maze
+from mazefile import EXTENSIONS
+from search import search, SEARCH_METHODS
+
+def expand_inputs(patterns):
+    """
+    @param patterns: maze files, directories (searched recursively for the
+        mazefile.EXTENSIONS, *.txt and *.mazb) or glob patterns
+
+    @return files: the sorted list of distinct maze files
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for ext in EXTENSIONS:
+                files.update(glob.glob(os.path.join(pattern, "**", "*" + ext), recursive=True))
+        else:
+            files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(files)
+
+def solve_one(filename, method, images=None, scale=render.SCALE):
+    """
+    Loads and solves a single maze in the current process.
+
+    @param images: directory to save the solved maze to as <name>.png, None for no image
+    @param scale: pixels per cell of the image
+
+    @return result: a dict with the file, method, status, path, path length, states
+        explored, isValidPath verdict, and load and search times, and the image file
+        and its render time if one was saved
+    """
+    t0 = time.perf_counter()
+    maze = Maze(filename)
+    t1 = time.perf_counter()
+    path = search(maze, method)
+    t2 = time.perf_counter()
+    result = {
+        "file": filename,
+        "method": method,
+        "status": "ok",
+        "path": path,
+        "path_length": len(path),
+        "states_explored": maze.getStatesExplored(),
+        "verdict": maze.isValidPath(path),
+        "load_time": t1 - t0,
+        "search_time": t2 - t1,
+    }
+    if images is not None:
+        image = os.path.join(images, os.path.splitext(os.path.basename(filename))[0] + ".png")
+        render.save_image(maze, path, image, scale)
+        result["image"] = image
+        result["render_time"] = time.perf_counter() - t2
+    return result
+
+def _worker(conn):
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        filename, method = task[:2]
+        try:
+            # Maze prints its error on stdout before raising SystemExit for a bad file
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                result = solve_one(*task)
+        except SystemExit:
+            result = {"file": filename, "method": method, "status": "error", "error": out.getvalue().strip()}
+        except Exception as e:
+            result = {"file": filename, "method": method, "status": "error",
+                      "error": "%s: %s" % (type(e).__name__, e)}
+        conn.send(result)
+    conn.close()
+
+class _Slot:
+    # One worker process of the pool and the task it is busy with, if any
+    def __init__(self):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+        self.deadline = None
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+def solve_batch(files, method, workers=None, timeout=None, images=None, scale=render.SCALE):
+    """
+    Solves many mazes in parallel.
+
+    @param files: maze file paths
+    @param method: a key of search.SEARCH_METHODS
+    @param workers: number of worker processes - default os.cpu_count()
+    @param timeout: seconds allowed per maze, None for no limit
+    @param images, scale: as in solve_one
+
+    @return results: a generator of solve_one results in completion order; mazes that
+        fail have status "error" and mazes that run out of time have status "timeout"
+    """
+    pending = [(f, method, images, scale) for f in reversed(files)]
+    if not pending:
+        return
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    slots = [_Slot() for _ in range(workers)]
+    try:
+        while True:
+            for slot in slots:
+                if slot.task is None and pending:
+                    slot.task = pending.pop()
+                    slot.deadline = None if timeout is None else time.monotonic() + timeout
+                    slot.conn.send(slot.task)
+            busy = [slot for slot in slots if slot.task is not None]
+            if not busy:
+                break
+
+            deadlines = [slot.deadline for slot in busy if slot.deadline is not None]
+            wait_time = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = wait([slot.conn for slot in busy], wait_time)
+
+            for slot in busy:
+                if slot.conn in ready:
+                    try:
+                        result = slot.conn.recv()
+                    except EOFError:
+                        # the worker died, e.g. out of memory
+                        result = {"file": slot.task[0], "method": method, "status": "error",
+                                  "error": "worker exited with code %s" % slot.process.exitcode}
+                        slot.stop(kill=True)
+                        slots[slots.index(slot)] = _Slot()
+                    slot.task = None
+                    yield result
+                elif slot.deadline is not None and time.monotonic() >= slot.deadline:
+                    filename = slot.task[0]
+                    slot.stop(kill=True)
+                    slots[slots.index(slot)] = _Slot()
+                    yield {"file": filename, "method": method, "status": "timeout"}
+    finally:
+        for slot in slots:
+            slot.stop(kill=slot.task is not None)
+
+def summarize(results, wall_time):
+    """
+    @return summary: counts per status and verdict, total search time, wall time and
+        mazes solved per second
+    """
+    summary = {"mazes": len(results), "ok": 0, "valid": 0, "error": 0, "timeout": 0,
+               "search_time": 0.0, "wall_time": wall_time}
+    for r in results:
+        summary[r["status"]] += 1
+        if r["status"] == "ok":
+            summary["search_time"] += r["search_time"]
+            if r["verdict"] == "Valid":
+                summary["valid"] += 1
+    summary["mazes_per_second"] = len(results) / wall_time if wall_time > 0 else None
+    return summary
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='HW1 Batch Solver')
+
+    parser.add_argument('inputs', nargs='+',
+                        help='maze files, directories or glob patterns [REQUIRED]')
+    parser.add_argument('--method', dest="search", type=str, default = "bfs",
+                        choices = list(SEARCH_METHODS),
+                        help='search method - default bfs')
+    parser.add_argument('--workers', dest="workers", type=int, default = None,
+                        help='worker processes - default one per core')
+    parser.add_argument('--timeout', dest="timeout", type=float, default = None,
+                        help='seconds allowed per maze - default no limit')
+    parser.add_argument('--out', dest="out", type=str, default = None,
+                        help='write every result, path included, as a JSON line to this file')
+    parser.add_argument('--images', dest="images", type=str, default = None,
+                        help='save every solved maze as a PNG to this directory - default off')
+    parser.add_argument('--scale', dest="scale", type=int, default = render.SCALE,
+                        help='pixels per cell of the images - default %d' % render.SCALE)
+
+    args = parser.parse_args()
+    if args.images is not None:
+        if not render.available:
+            parser.error("--images requires NumPy")
+        os.makedirs(args.images, exist_ok=True)
+    files = expand_inputs(args.inputs)
+    out = open(args.out, "w") if args.out else None
+    results = []
+    t = time.perf_counter()
+    for result in solve_batch(files, args.search, args.workers, args.timeout, args.images, args.scale):
+        if out is not None:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+        result.pop("path", None)
+        results.append(result)
+        if result["status"] == "ok":
+            print("%-40s len %5d  explored %8d  %.4fs  %s" % (result["file"], result["path_length"],
+                  result["states_explored"], result["search_time"], result["verdict"]))
+        else:
+            print("%-40s %s" % (result["file"], result["status"]))
+    if out is not None:
+        out.close()
+    print(json.dumps(summarize(results, time.perf_counter() - t), indent=2))
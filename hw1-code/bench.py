@@ -0,0 +1,169 @@
+# bench.py
+# ---------------
+"""
+This file contains the headless benchmark for the search methods. It never
+imports pygame. Every map under maps/single, maps/corner and maps/multi is
+solved with every method in search.SEARCH_METHODS, each (map, method) pair in
+its own process so that a pair that runs too long can be cut off, and the
+results are written out as a JSON or CSV report. Every timed run starts with
+cold caches, so the distance-table preprocessing of the multi-objective
+methods is part of the timings.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+
+import cache
+import search as search_module
+from maze import Maze
+from mazefile import EXTENSIONS
+from search import search, SEARCH_METHODS
+
+MAP_DIRS = ("single", "corner", "multi")
+
+FIELDS = ["map", "method", "status", "path_length", "states_explored", "verdict",
+          "time_min", "time_mean", "time_max", "load_time_mean", "peak_memory_kb", "error"]
+
+def find_maps(root, dirs=MAP_DIRS):
+    maps = []
+    for d in dirs:
+        maps += sorted(p for ext in EXTENSIONS for p in glob.glob(os.path.join(root, d, "*" + ext)))
+    return maps
+
+def run_case(filename, method, repeat=3, warmup=1):
+    """
+    Solves one maze with one method in the current process. The disk cache is off
+    and the in-memory distance tables are dropped before every run, so that no run
+    reuses the preprocessing of the one before it.
+
+    @param filename: path to the maze file
+    @param method: a key of search.SEARCH_METHODS
+    @param repeat: number of timed runs
+    @param warmup: number of untimed runs before them
+
+    @return result: a dict with the FIELDS of a report row, except map, method, status and error
+    """
+    times = []
+    load_times = []
+    enabled = cache.ENABLED
+    cache.ENABLED = False
+    for k in range(warmup + repeat):
+        search_module.table_cache.clear()
+        t0 = time.perf_counter()
+        maze = Maze(filename)
+        t1 = time.perf_counter()
+        path = search(maze, method)
+        t2 = time.perf_counter()
+        if k >= warmup:
+            load_times.append(t1 - t0)
+            times.append(t2 - t1)
+
+    # one extra run under tracemalloc for the peak memory, kept out of the timings
+    search_module.table_cache.clear()
+    tracemalloc.start()
+    maze = Maze(filename)
+    path = search(maze, method)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    verdict = maze.isValidPath(path)
+    cache.ENABLED = enabled
+    return {
+        "path_length": len(path),
+        "states_explored": maze.getStatesExplored(),
+        "verdict": verdict,
+        "time_min": min(times),
+        "time_mean": sum(times) / len(times),
+        "time_max": max(times),
+        "load_time_mean": sum(load_times) / len(load_times),
+        "peak_memory_kb": peak // 1024,
+    }
+
+def _worker(conn, filename, method, repeat, warmup):
+    try:
+        conn.send(("ok", run_case(filename, method, repeat, warmup)))
+    except Exception as e:
+        conn.send(("error", "%s: %s" % (type(e).__name__, e)))
+    finally:
+        conn.close()
+
+def run_isolated(filename, method, repeat=3, warmup=1, timeout=30):
+    """
+    Runs run_case in a child process and gives up on it after timeout seconds.
+
+    @return row: a report row; status is "ok", "error" or "timeout"
+    """
+    row = dict.fromkeys(FIELDS)
+    row["map"] = filename
+    row["method"] = method
+    parent, child = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(target=_worker, args=(child, filename, method, repeat, warmup))
+    proc.start()
+    child.close()
+    if parent.poll(timeout):
+        try:
+            status, payload = parent.recv()
+        except EOFError:
+            status, payload = "error", "worker exited with code %s" % proc.exitcode
+    else:
+        status, payload = "timeout", None
+        proc.terminate()
+    proc.join()
+    row["status"] = status
+    if status == "ok":
+        row.update(payload)
+    elif status == "error":
+        row["error"] = payload
+    return row
+
+def write_report(rows, path):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='HW1 Search Benchmark')
+
+    parser.add_argument('--maps', dest="maps", type=str, default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps"),
+                        help='root of the map folders - default maps/ next to this file')
+    parser.add_argument('--method', dest="methods", type=str, action="append", choices = list(SEARCH_METHODS),
+                        help='method to benchmark, may be repeated - default all')
+    parser.add_argument('--repeat', dest="repeat", type=int, default = 3,
+                        help='timed runs per map and method - default 3')
+    parser.add_argument('--warmup', dest="warmup", type=int, default = 1,
+                        help='untimed runs before the timed ones - default 1')
+    parser.add_argument('--timeout', dest="timeout", type=float, default = 30,
+                        help='seconds allowed per map and method, all runs included - default 30')
+    parser.add_argument('--out', dest="out", type=str, default = None,
+                        help='report file, .csv for CSV and JSON otherwise - default JSON on stdout')
+
+    args = parser.parse_args()
+    rows = []
+    for filename in find_maps(args.maps):
+        for method in args.methods or list(SEARCH_METHODS):
+            row = run_isolated(filename, method, args.repeat, args.warmup, args.timeout)
+            rows.append(row)
+            if row["status"] == "ok":
+                print("%-40s %-14s len %5d  explored %8d  %.4fs  %s" % (filename, method, row["path_length"],
+                      row["states_explored"], row["time_min"], row["verdict"]), file=sys.stderr)
+            else:
+                print("%-40s %-14s %s" % (filename, method, row["status"]), file=sys.stderr)
+
+    if args.out is None:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        write_report(rows, args.out)
@@ -0,0 +1,164 @@
+# cache.py
+# ---------------
+"""
+This file contains the on-disk cache for the objective distance matrix and the
+MST heuristic values of a maze, and the bounded in-memory memo used for the
+MST values during search. Entries are keyed by a hash of the maze as
+parsed by Maze.__init__ (grid, start and objectives), so an edited maze file
+never matches an old entry.
+
+File layout (little endian):
+    header   MAGIC, version, node count n, MST entry count m
+    digest   32 byte sha256 of the maze
+    matrix   n * n int32 distances, row major
+    mst      m records of (uint16 mask byte length, int32 weight, mask bytes)
+"""
+
+import os
+import sys
+import struct
+import hashlib
+from array import array
+from collections import OrderedDict
+
+MAGIC = b'MZDC'
+VERSION = 1
+HEADER = struct.Struct('<4sHII')
+RECORD = struct.Struct('<Hi')
+
+CACHE_DIR = os.environ.get('MAZE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.mazecache'))
+ENABLED = os.environ.get('MAZE_CACHE', '1') != '0'
+
+# Returns the sha256 digest of the parsed maze, the same for its text and binary files
+def maze_digest(maze):
+    h = hashlib.sha256()
+    h.update(repr(maze.getDimensions()).encode())
+    h.update(maze.walls)
+    h.update(repr((maze.getStart(), maze.getObjectives())).encode())
+    return h.digest()
+
+def cache_path(digest):
+    return os.path.join(CACHE_DIR, digest.hex()[:32] + '.bin')
+
+def load_tables(maze):
+    """
+    Loads the cached tables of a maze.
+
+    @param maze: The maze to look up.
+
+    @return matrix: the (n + 1) x (n + 1) distance matrix, or None on a cache miss
+    @return mst_dict: a dict from objective bitmask to MST weight, empty on a miss
+    """
+    if not ENABLED:
+        return None, {}
+    digest = maze_digest(maze)
+    n = len(maze.getObjectives()) + 1
+    try:
+        with open(cache_path(digest), 'rb') as f:
+            data = f.read()
+        magic, version, count, m = HEADER.unpack_from(data, 0)
+        offset = HEADER.size
+        if magic != MAGIC or version != VERSION or count != n or data[offset:offset + 32] != digest:
+            return None, {}
+        offset += 32
+        flat = array('i')
+        flat.frombytes(data[offset:offset + 4 * n * n])
+        if sys.byteorder == 'big':
+            flat.byteswap()
+        offset += 4 * n * n
+        mst_dict = {}
+        for _ in range(m):
+            size, weight = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            mst_dict[int.from_bytes(data[offset:offset + size], 'little')] = weight
+            offset += size
+    except (OSError, struct.error, ValueError):
+        return None, {}
+    # a short matrix or a cut last mask would otherwise read back as wrong entries
+    if len(flat) != n * n or offset != len(data):
+        return None, {}
+    return [flat[i * n:(i + 1) * n].tolist() for i in range(n)], mst_dict
+
+def save_tables(maze, matrix, mst_dict):
+    """
+    Writes the tables of a maze to the cache, replacing any older entry. Failures
+    to write are ignored, since the cache is only an optimization.
+
+    @param maze: The maze the tables were computed on.
+    @param matrix: the (n + 1) x (n + 1) distance matrix
+    @param mst_dict: a dict or LRUCache from objective bitmask to MST weight
+    """
+    if not ENABLED:
+        return
+    digest = maze_digest(maze)
+    chunks = [HEADER.pack(MAGIC, VERSION, len(matrix), len(mst_dict)), digest]
+    flat = array('i')
+    for row in matrix:
+        flat.extend(row)
+    if sys.byteorder == 'big':
+        flat.byteswap()
+    chunks.append(flat.tobytes())
+    for mask, weight in mst_dict.items():
+        raw = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        chunks.append(RECORD.pack(len(raw), weight))
+        chunks.append(raw)
+    path = cache_path(digest)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(chunks))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+class LRUCache:
+    # A memo with a bound on the number of entries that evicts the least recently
+    # used entry first, and counts hits, misses and evictions
+    def __init__(self, maxsize, items=()):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__data = OrderedDict()
+        for key, value in items:
+            self.put(key, value)
+
+    # Returns the cached value of key, or None on a miss
+    def get(self, key):
+        value = self.__data.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+            self.evictions += 1
+
+    def items(self):
+        return self.__data.items()
+
+    # Drops every entry, keeping the counters
+    def clear(self):
+        self.__data.clear()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.__data),
+            "maxsize": self.maxsize,
+        }
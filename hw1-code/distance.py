@@ -0,0 +1,114 @@
+# distance.py
+# ---------------
+"""
+This file contains the objective distance engine. It runs one breadth-first
+wavefront per objective, vectorized with wavefront.py when NumPy is installed
+and over the maze's precomputed adjacency table otherwise, and collects the
+true maze distance between every pair of objectives, including the start,
+into a single matrix that the search methods can share. On large mazes the
+wavefronts are spread over a process pool. Only the matrix is kept: a field is
+reduced to its row as soon as it is computed, and paths are read from a field
+computed again when asked for.
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import wavefront
+from wavefront import UNREACHABLE, descend
+
+# Worker processes used to build a table, overridable with MAZE_DISTANCE_WORKERS
+WORKERS = int(os.environ.get('MAZE_DISTANCE_WORKERS', os.cpu_count() or 1))
+
+# Below this many cells * nodes, starting a pool costs more than it saves
+PARALLEL_MIN_WORK = 1 << 21
+
+# Returns the BFS distance from source to every flat cell index, UNREACHABLE for walls
+# and cells that cannot be reached
+def bfs_field(adjacency, source):
+    field = [UNREACHABLE] * len(adjacency)
+    field[source] = 0
+    q = deque([source])
+    while q:
+        cell = q.popleft()
+        d = field[cell] + 1
+        for n in adjacency[cell]:
+            if field[n] == UNREACHABLE:
+                field[n] = d
+                q.append(n)
+    return field
+
+# The adjacency table, wall grid and node cells of the table being built, set once
+# per pool worker (inherited without a copy where processes fork)
+_shared = None
+
+def _init_worker(adjacency, grid, cells):
+    global _shared
+    _shared = (adjacency, grid, cells)
+
+def _distance_rows(sources):
+    adjacency, grid, cells = _shared
+    return _rows(adjacency, grid, sources, cells)
+
+# Returns the distances from each of the given flat source cells to the given cells
+# as rows of ints, computed a batch of fields at a time on the NumPy grid if there is
+# one and one BFS at a time otherwise, so that no more than a batch of fields is held
+def _rows(adjacency, grid, sources, cells):
+    if grid is None:
+        return [[field[cell] for cell in cells] for field in (bfs_field(adjacency, source) for source in sources)]
+    cols = grid.shape[1] - 2
+    r = [cell // cols for cell in cells]
+    c = [cell % cols for cell in cells]
+    rows = []
+    for fields in wavefront.field_batches(grid, [divmod(source, cols) for source in sources]):
+        rows += fields[:, r, c].tolist()
+    return rows
+
+class DistanceTable:
+    # Builds the distance table of the maze. Node 0 is the start and node i + 1 is
+    # objective i in maze.getObjectives() order. The maze is only read, never modified.
+    # If a matrix is given (e.g. loaded from the cache), it is used as it is. With more
+    # than one worker the rows are computed on a process pool.
+    def __init__(self, maze, matrix=None, workers=None):
+        self.cols = maze.getDimensions()[1]
+        self.nodes = [maze.getStart()] + maze.getObjectives()
+        self.cells = [r * self.cols + c for r, c in self.nodes]
+        self.grid = wavefront.open_grid(maze) if wavefront.available else None
+        # the wavefront engine works on the grid alone
+        self.adjacency = maze.getCellNeighborTable() if self.grid is None else None
+        n = len(self.cells)
+        if matrix is not None:
+            self.matrix = matrix
+            return
+
+        if workers is None:
+            rows, cols = maze.getDimensions()
+            workers = WORKERS if rows * cols * n >= PARALLEL_MIN_WORK else 1
+        # daemonic processes (e.g. batch.py workers) may not start a pool
+        if workers > 1 and n > 1 and not multiprocessing.current_process().daemon:
+            chunksize = max(1, n // (4 * workers))
+            chunks = [self.cells[k:k + chunksize] for k in range(0, n, chunksize)]
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(self.adjacency, self.grid, self.cells)) as pool:
+                self.matrix = [row for rows in pool.map(_distance_rows, chunks) for row in rows]
+        else:
+            self.matrix = _rows(self.adjacency, self.grid, self.cells, self.cells)
+
+    # Returns the flat BFS distance field of node j; with node i, only the cells closer
+    # to node j than node i are sure to be filled in
+    def field(self, j, i=None):
+        if self.grid is None:
+            return bfs_field(self.adjacency, self.cells[j])
+        return wavefront.distance_field(self.grid, self.nodes[j], None if i is None else self.nodes[i])
+
+    # Returns the true maze distance between nodes i and j
+    def distance(self, i, j):
+        return self.matrix[i][j]
+
+    # Returns a shortest path from node i to node j as a list of (row, col) tuples, by
+    # walking down node j's distance field from node i; the field is computed for this
+    # path alone and stops growing once it reaches node i
+    def path(self, i, j):
+        return descend(self.field(j, i), self.cells[i], self.cols)
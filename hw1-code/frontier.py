@@ -0,0 +1,109 @@
+# frontier.py
+# ---------------
+"""
+This file contains the state bookkeeping shared by the searches. StateStore
+holds parent pointers as ids into flat arrays, and OpenList adds a binary heap
+with lazy deletion on top: pushing a state again with a better g supersedes
+the old entry, which is then skipped when it reaches the top of the heap.
+"""
+
+import heapq
+from array import array
+
+class StateStore:
+    # Gives each distinct search state a dense integer id and keeps the id of its
+    # parent in a flat array, so that path reconstruction does not need a dict
+    # entry holding the whole parent state
+    def __init__(self):
+        self.ids = {}
+        self.states = []
+        self.parents = array('l')
+
+    # Registers a new state and returns its id
+    def add(self, state, parent=-1):
+        i = len(self.states)
+        self.ids[state] = i
+        self.states.append(state)
+        self.parents.append(parent)
+        return i
+
+    # Returns the states on the way from the root to the state with id i
+    def trace(self, i):
+        states = []
+        while i != -1:
+            states.append(self.states[i])
+            i = self.parents[i]
+        states.reverse()
+        return states
+
+class OpenList(StateStore):
+    def __init__(self):
+        StateStore.__init__(self)
+        self.heap = []
+        self.g = array('l')
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+        self.peak = 0
+        # f of the entry pop returned last
+        self.last_f = None
+
+    # Returns True if g beats the best known cost-so-far of state, i.e. if the state
+    # should be pushed. Callers check this before paying for the heuristic.
+    def improves(self, state, g):
+        i = self.ids.get(state)
+        return i is None or g < self.g[i]
+
+    # Adds state with cost-so-far g and heuristic h, reached from the state with id
+    # parent, superseding any older entry
+    def push(self, state, g, h, parent=-1):
+        i = self.ids.get(state)
+        if i is None:
+            i = self.add(state, parent)
+            self.g.append(g)
+        else:
+            self.g[i] = g
+            self.parents[i] = parent
+        # ties on f go to the deeper entry, which is closer to a goal
+        heapq.heappush(self.heap, (g + h, -g, i))
+        self.pushes += 1
+        if len(self.heap) > self.peak:
+            self.peak = len(self.heap)
+
+    # Removes and returns the (id, state, g) with the lowest f, skipping superseded
+    # entries, or None when the open list is empty
+    def pop(self):
+        heap = self.heap
+        while heap:
+            f, neg_g, i = heapq.heappop(heap)
+            if self.g[i] != -neg_g:
+                self.stale += 1
+                continue
+            self.pops += 1
+            self.last_f = f
+            return i, self.states[i], -neg_g
+        return None
+
+    # Returns the lowest f on the open list, dropping superseded entries from the top,
+    # or None when the open list is empty
+    def top_f(self):
+        heap = self.heap
+        while heap and self.g[heap[0][2]] != -heap[0][1]:
+            heapq.heappop(heap)
+            self.stale += 1
+        return heap[0][0] if heap else None
+
+    # An open list holding only superseded entries is empty
+    def __bool__(self):
+        return self.top_f() is not None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def stats(self):
+        return {
+            "pushes": self.pushes,
+            "pops": self.pops,
+            "stale": self.stale,
+            "peak": self.peak,
+        }
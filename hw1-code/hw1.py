@@ -11,21 +11,42 @@
 """
 This file contains the main application that is run for this homework. It
 initializes the pygame context, and handles the interface between the
-game and the search algorithm.
+game and the search algorithm. pygame is only imported when something is
+drawn, and render.py, with NumPy, only when a frame is drawn or saved, so a
+--headless run never loads either.
 """
 
-import pygame
 import sys
 import argparse
 import time
 
-from pygame.locals import *
-from agent import Agent
 from maze import Maze
-from search import search
+import search as search_module
+from search import search, heuristic_cache_stats, open_list_stats, SEARCH_METHODS
+from instrument import Profile, instrumented_search
+
+# Bound by load_pygame and load_render on first use
+pygame = None
+render = None
+
+# Imports pygame on first use, so that headless runs never load it
+def load_pygame():
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
+# Imports render.py, and with it NumPy, on first use
+def load_render():
+    global render
+    if render is None:
+        import render as module
+        render = module
+    return render
 
 class Application:
-    def __init__(self, human=True, scale=20, fps=30,alt_color=False):
+    def __init__(self, human=True, scale=20, fps=30,alt_color=False, headless=False):
         self.running = True
         self.displaySurface = None
         self.scale = scale
@@ -33,6 +54,7 @@ class Application:
         self.windowTitle = "HW1: "
         self.__human = human
         self.alt_color = alt_color
+        self.headless = headless
 
     # Initializes the pygame context and certain properties of the maze
     def initialize(self, filename):
@@ -48,12 +70,15 @@ class Application:
         self.blockSizeY = int(self.windowHeight / self.gridDim[0])
 
         if self.__human:
+            from agent import Agent
             self.agentRadius = min(self.blockSizeX, self.blockSizeY) / 4
             self.agent = Agent(self.maze.getStart(), self.maze, self.blockSizeX, self.blockSizeY)
 
     # Once the application is initiated, execute is in charge of drawing the game and dealing with the game loop
-    def execute(self, filename, searchMethod, save):
+    def execute(self, filename, searchMethod, save, profile=None):
+        t0 = time.perf_counter()
         self.initialize(filename)
+        load_time = time.perf_counter() - t0
 
         if self.maze is None:
             print("No maze created")
@@ -61,12 +86,45 @@ class Application:
 
         if not self.__human:
             t1 = time.time()
-            path = search(self.maze, searchMethod)
+            try:
+                if profile is None:
+                    path = search(self.maze, searchMethod)
+                else:
+                    report = Profile()
+                    report.phases["load"] = load_time
+                    path = instrumented_search(self.maze, searchMethod, report)
+            except ValueError as e:
+                print(e)
+                raise SystemExit
             total_time = time.time()-t1  #time in seconds
+            if profile is not None:
+                with report.phase("validate"):
+                    report.captures["run"] = {"file": filename, "method": searchMethod,
+                                              "verdict": self.maze.isValidPath(path)}
+                report.counters["path_length"] = len(path)
+                with open(profile, "w") as f:
+                    f.write(report.to_json())
             statesExplored = self.maze.getStatesExplored()
+            cacheStats = heuristic_cache_stats()
+            openStats = open_list_stats()
+            print("Results")
+            print("Path Length:", len(path))
+            print("States Explored:", statesExplored)
+            if openStats is not None:
+                print("Open List: peak {peak}, pushes {pushes}, pops {pops}, stale pops {stale}".format(**openStats))
+            if cacheStats is not None:
+                print("Heuristic Cache: hits {hits}, misses {misses}, evictions {evictions}, size {size}/{maxsize}".format(**cacheStats))
+            print("Total time", total_time,"seconds")
         else:
             path, statesExplored = [], 0
 
+        if save is not None and not self.__human and load_render().can_export(save):
+            render.write_png(self.renderFrame(path), save)
+            return
+        if self.headless:
+            return
+
+        load_pygame()
         pygame.init()
         self.displaySurface = pygame.display.set_mode((self.windowWidth, self.windowHeight), pygame.HWSURFACE)
         self.displaySurface.fill((255, 255, 255))
@@ -75,16 +133,14 @@ class Application:
 
         if self.__human:
             self.drawPlayer()
+
+        if load_render().available:
+            self.drawFrame(path)
         else:
-            print("Results")
-            print("Path Length:", len(path))
-            print("States Explored:", statesExplored)
-            print("Total time", total_time,"seconds")
             self.drawPath(path)
-
-        self.drawMaze()
-        self.drawStart()
-        self.drawObjective()
+            self.drawMaze()
+            self.drawStart()
+            self.drawObjective()
 
         pygame.display.flip()
         if save is not None:
@@ -98,7 +154,7 @@ class Application:
             keys = pygame.key.get_pressed()
             clock.tick(self.fps)
 
-            if (keys[K_ESCAPE]):
+            if (keys[pygame.K_ESCAPE]):
                     raise SystemExit
 
             for event in pygame.event.get():
@@ -106,16 +162,16 @@ class Application:
                     raise SystemExit
 
             if self.__human:
-                if (keys[K_RIGHT]):
+                if (keys[pygame.K_RIGHT]):
                     self.agent.moveRight()
 
-                if (keys[K_LEFT]):
+                if (keys[pygame.K_LEFT]):
                     self.agent.moveLeft()
 
-                if (keys[K_UP]):
+                if (keys[pygame.K_UP]):
                     self.agent.moveUp()
 
-                if (keys[K_DOWN]):
+                if (keys[pygame.K_DOWN]):
                     self.agent.moveDown()
 
                 self.gameLoop()
@@ -154,6 +210,16 @@ class Application:
 
         return (red, green, blue)
 
+    # Builds the full maze, start, objectives and path as one RGB array, with the colors of getColor
+    def renderFrame(self, path):
+        colors = (self.getColor(1, 0, self.alt_color), self.getColor(1, 1, self.alt_color))
+        return render.render_frame(self.maze, path, self.scale, colors)
+
+    # Draws the frame of renderFrame to the display context in a single blit
+    def drawFrame(self, path):
+        frame = self.renderFrame(path)
+        self.displaySurface.blit(pygame.image.frombuffer(frame, (self.windowWidth, self.windowHeight), "RGB"), (0, 0))
+
     # Draws the path (given as a list of (row, col) tuples) to the display context
     def drawPath(self, path):
         for p in range(len(path)):
@@ -204,7 +270,7 @@ if __name__ == "__main__":
     parser.add_argument('filename',
                         help='path to maze file [REQUIRED]')
     parser.add_argument('--method', dest="search", type=str, default = "bfs",
-                        choices = ["bfs", "astar_corner", "astar", "fast", "astar_multi"],
+                        choices = list(SEARCH_METHODS),
                         help='search method - default bfs')
     parser.add_argument('--scale', dest="scale", type=int, default = 20,
                         help='scale - default: 20')
@@ -213,11 +279,20 @@ if __name__ == "__main__":
     parser.add_argument('--human', default = False, action = "store_true",
                         help='flag for human playable - default False')
     parser.add_argument('--save', dest="save", type=str, default = None,
-                        help='save output to image file - default not saved')
+                        help='save output to image file, without opening a window if it is a PNG - default not saved')
+    parser.add_argument('--mstcache', dest="mstcache", type=int, default = search_module.MST_CACHE_SIZE,
+                        help='max objective subsets kept in the MST heuristic cache - default %d' % search_module.MST_CACHE_SIZE)
     parser.add_argument('--altcolor', dest="altcolor", default = False, action = "store_true",
                         help='View in an alternate color scheme.')
+    parser.add_argument('--profile', dest="profile", type=str, default = None,
+                        help='write search counters and phase times as JSON to this file - default off')
+    parser.add_argument('--headless', dest="headless", default = False, action = "store_true",
+                        help='print the results and exit without opening a window - default False')
 
 
     args = parser.parse_args()
-    app = Application(args.human, args.scale, args.fps,args.altcolor)
-    app.execute(args.filename, args.search, args.save)
+    if args.headless and (args.human or (args.save is not None and not load_render().can_export(args.save))):
+        parser.error("--headless cannot be combined with --human, or with --save unless it writes a PNG with NumPy installed")
+    search_module.MST_CACHE_SIZE = args.mstcache
+    app = Application(args.human, args.scale, args.fps,args.altcolor, args.headless)
+    app.execute(args.filename, args.search, args.save, args.profile)
@@ -0,0 +1,240 @@
+# instrument.py
+# ---------------
+"""
+This file contains the instrumentation layer of the search engine. A Profile
+collects counters and phase timers, and optionally a cProfile or tracemalloc
+capture, and exports them as JSON. instrumented_search runs a search under a
+Profile by wrapping the heuristic, preprocessing and path reconstruction
+functions of search.py, and the trace of frontier.StateStore, for the duration
+of the run. The search code itself has no hooks, so plain search() calls cost
+nothing extra.
+
+Every method reports its expansions and peak frontier, and all but fast and
+held_karp, which search no state space, the peak size of their closed set.
+Only the methods with an open list (the A* family, jps and corridor) report
+heap counters; bfs, bibfs and wavefront keep a plain queue or wavefront, so
+their pops are their expansions.
+
+Run this file to profile one maze and method:
+
+    python instrument.py maps/multi/mediumSearch.txt --method astar_multi --cprofile
+"""
+
+import io
+import json
+import time
+import pstats
+import argparse
+import cProfile
+import contextlib
+import tracemalloc
+
+import search as search_module
+from maze import Maze
+from frontier import StateStore
+
+# search.py functions whose outermost calls are counted as heuristic calls
+HEURISTICS = ("manhattan_distance", "heuristic_corner", "heuristic_multi")
+
+# search.py functions timed as phases, by phase name
+PHASE_FUNCTIONS = {
+    "preprocess": ("actual_cost_table", "multi_tables"),
+    "reconstruct": ("state_path", "meeting_path", "jump_path", "corridor_path", "descend", "tour_path"),
+}
+
+# Methods of search.py classes timed as phases, by phase name; OpenList inherits trace
+PHASE_METHODS = {
+    "reconstruct": ((StateStore, "trace"),),
+}
+
+# Functions listed in the cProfile capture
+CPROFILE_TOP = 25
+
+class Profile:
+    # Counters, accumulated phase times in seconds and optional captures of one or
+    # more instrumented runs. cprofile and memory turn on the cProfile and tracemalloc
+    # captures of the search phase, which slow it down.
+    def __init__(self, cprofile=False, memory=False):
+        self.counters = {}
+        self.phases = {}
+        self.captures = {}
+        self.cprofile = cprofile
+        self.memory = memory
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # Times the enclosed block and adds it to the named phase
+    @contextlib.contextmanager
+    def phase(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t
+
+    def to_dict(self):
+        return {"counters": dict(self.counters), "phases": dict(self.phases), **self.captures}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+def _count_outermost(profile, name, fn, depth):
+    # heuristics call each other (and themselves) internally; depth is shared by all
+    # of them, so only the call made by the search is counted
+    def wrapper(*args):
+        if depth[0] == 0:
+            profile.count(name)
+        depth[0] += 1
+        try:
+            return fn(*args)
+        finally:
+            depth[0] -= 1
+    return wrapper
+
+def _timed(profile, name, fn, depth):
+    # like _count_outermost, only the outermost call of a phase is timed, so that a
+    # phase function calling another is not counted twice
+    def wrapper(*args, **kwargs):
+        if depth[0]:
+            return fn(*args, **kwargs)
+        depth[0] += 1
+        try:
+            with profile.phase(name):
+                return fn(*args, **kwargs)
+        finally:
+            depth[0] -= 1
+    return wrapper
+
+@contextlib.contextmanager
+def _hooks(profile):
+    # Swaps the instrumented wrappers into search.py and puts the originals back
+    depth = [0]
+    wrappers = {fn: _count_outermost(profile, "heuristic_calls", getattr(search_module, fn), depth)
+                for fn in HEURISTICS}
+    depths = {phase: [0] for phase in set(PHASE_FUNCTIONS) | set(PHASE_METHODS)}
+    for phase, fns in PHASE_FUNCTIONS.items():
+        for fn in fns:
+            wrappers[fn] = _timed(profile, phase, getattr(search_module, fn), depths[phase])
+    methods = {(cls, name): _timed(profile, phase, getattr(cls, name), depths[phase])
+               for phase, entries in PHASE_METHODS.items() for cls, name in entries}
+    originals = {fn: getattr(search_module, fn) for fn in wrappers}
+    original_methods = {(cls, name): cls.__dict__[name] for cls, name in methods}
+    try:
+        for fn, wrapper in wrappers.items():
+            setattr(search_module, fn, wrapper)
+        for (cls, name), wrapper in methods.items():
+            setattr(cls, name, wrapper)
+        yield
+    finally:
+        for fn, original in originals.items():
+            setattr(search_module, fn, original)
+        for (cls, name), original in original_methods.items():
+            setattr(cls, name, original)
+
+@contextlib.contextmanager
+def _captures(profile):
+    profiler = cProfile.Profile() if profile.cprofile else None
+    if profile.memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats("cumulative")
+            top = []
+            for (filename, line, function), (cc, nc, tt, ct, _) in stats.stats.items():
+                top.append({"function": "%s:%d(%s)" % (filename, line, function),
+                            "calls": nc, "tottime": tt, "cumtime": ct})
+            top.sort(key=lambda entry: entry["cumtime"], reverse=True)
+            profile.captures["cprofile"] = top[:CPROFILE_TOP]
+        if profile.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            profile.captures["tracemalloc"] = {"current_bytes": current, "peak_bytes": peak}
+
+def instrumented_search(maze, searchMethod, profile):
+    """
+    Runs search(maze, searchMethod) under a profile. Not reentrant: the hooks are
+    module-wide while the search runs.
+
+    @param profile: the Profile the counters and phases are added to
+
+    @return path: the path search() would have returned
+    """
+    path = None
+    expansions = 0
+    peak = 0
+    with _hooks(profile), profile.phase("search"), _captures(profile):
+        for event in search_module.search_iter(maze, searchMethod):
+            if isinstance(event, search_module.SearchResult):
+                path = event.path
+            else:
+                expansions += 1
+                if event.frontier > peak:
+                    peak = event.frontier
+
+    profile.count("expansions", expansions)
+    profile.count("states_explored", maze.getStatesExplored())
+    profile.counters["peak_frontier"] = max(peak, profile.counters.get("peak_frontier", 0))
+    closed = search_module.closed_set_size()
+    if closed is not None:
+        profile.counters["peak_closed"] = max(closed, profile.counters.get("peak_closed", 0))
+    openStats = search_module.open_list_stats()
+    if openStats is not None:
+        profile.count("heap_pushes", openStats["pushes"])
+        profile.count("heap_pops", openStats["pops"])
+        profile.count("stale_pops", openStats["stale"])
+        profile.counters["peak_open"] = max(openStats["peak"], profile.counters.get("peak_open", 0))
+        # every state ever pushed, open or closed, has an entry in the store
+        profile.count("states_generated", len(search_module.open_list.states))
+    cacheStats = search_module.heuristic_cache_stats()
+    if cacheStats is not None:
+        profile.count("heuristic_cache_hits", cacheStats["hits"])
+        profile.count("heuristic_cache_misses", cacheStats["misses"])
+    return path
+
+def profile_run(filename, searchMethod, cprofile=False, memory=False):
+    """
+    Loads, solves and validates one maze under a new Profile.
+
+    @return profile: the Profile, with load, search, preprocess, reconstruct and
+        validate phases (preprocess and reconstruct are also part of search), and the
+        path length and verdict in its counters and captures
+    """
+    profile = Profile(cprofile, memory)
+    with profile.phase("load"):
+        maze = Maze(filename)
+    path = instrumented_search(maze, searchMethod, profile)
+    with profile.phase("validate"):
+        verdict = maze.isValidPath(path)
+    profile.counters["path_length"] = len(path)
+    profile.captures["run"] = {"file": filename, "method": searchMethod, "verdict": verdict}
+    return profile
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='HW1 Search Profiler')
+
+    parser.add_argument('filename',
+                        help='path to maze file [REQUIRED]')
+    parser.add_argument('--method', dest="search", type=str, default = "bfs",
+                        choices = list(search_module.SEARCH_METHODS),
+                        help='search method - default bfs')
+    parser.add_argument('--cprofile', dest="cprofile", default = False, action = "store_true",
+                        help='capture a cProfile of the search - default False')
+    parser.add_argument('--tracemalloc', dest="memory", default = False, action = "store_true",
+                        help='capture the peak memory of the search - default False')
+    parser.add_argument('--out', dest="out", type=str, default = None,
+                        help='JSON report file - default stdout')
+
+    args = parser.parse_args()
+    profile = profile_run(args.filename, args.search, args.cprofile, args.memory)
+    if args.out is None:
+        print(profile.to_json())
+    else:
+        with open(args.out, "w") as f:
+            f.write(profile.to_json())
@@ -13,50 +13,164 @@ This file contains the Maze class, which reads in a maze file and creates
 a representation of the maze that is exposed through a simple interface.
 """
 
-import re
-import copy
-from collections import Counter
+from itertools import chain
+
+from mazefile import read_maze
+
+# Paths at least this long are checked by isValidPath with NumPy, when it is installed
+VECTORIZE_MIN_PATH = 1 << 12
+
+# NumPy, bound by _loadNumpy for the first path long enough to need it, or False if it
+# is not installed
+np = None
+
+# Imports NumPy on first use, so that loading and solving a maze never pays for it;
+# returns False if it is not installed
+def _loadNumpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np is not False
+
+# Returns a function that adds each of the given offsets to a cell index, so that a
+# neighbor tuple is built with a single call
+def _offsetAdder(offsets):
+    if len(offsets) == 0:
+        return lambda cell: ()
+    if len(offsets) == 1:
+        a, = offsets
+        return lambda cell: (cell + a,)
+    if len(offsets) == 2:
+        a, b = offsets
+        return lambda cell: (cell + a, cell + b)
+    if len(offsets) == 3:
+        a, b, c = offsets
+        return lambda cell: (cell + a, cell + b, cell + c)
+    a, b, c, d = offsets
+    return lambda cell: (cell + a, cell + b, cell + c, cell + d)
 
 class Maze:
-    # Initializes the Maze object by reading the maze from a file
+    # Initializes the Maze object by reading the maze from a text or binary file
     def __init__(self, filename):
         self.__filename = filename
-        self.__wallChar = '%'
-        self.__startChar = 'P'
-        self.__objectiveChar = '.'
-        self.__start = None
-        self.__objective = []
         self.__states_explored = 0
 
-        with open(filename) as f:
-            lines = f.readlines()
+        try:
+            self.rows, self.cols, self.walls, start, objectives, self.__lines = read_maze(filename)
+        except ValueError as e:
+            print(e)
+            raise SystemExit
+        self.__start = start
+        self.__objective = objectives
+        self.__objectiveSet = set(self.__objective)
+        self.__graph = None
+
+    # The neighbor tables are only built when first looked up, so that a maze that is
+    # just loaded, drawn or handed to the wavefront engine never pays for them;
+    # afterwards they are plain attributes and this is not called again
+    def __getattr__(self, name):
+        if name == '_Maze__cellNeighbors':
+            self.__buildNeighbors()
+        elif name == '_Maze__neighbors':
+            cols = self.cols
+            self.__neighbors = [tuple([divmod(n, cols) for n in ns]) for ns in self.__cellNeighbors]
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
 
-        lines = list(filter(lambda x: not re.match(r'^\s*$', x), lines))
-        lines = [list(line.strip('\n')) for line in lines]
+    # Returns the maze as a list of rows of characters
+    @property
+    def mazeRaw(self):
+        if self.__lines is not None:
+            return [list(line.decode()) for line in self.__lines]
+        grid = [['%' if wall else ' ' for wall in self.walls[r * self.cols:(r + 1) * self.cols]] for r in range(self.rows)]
+        for r, c in self.__objective:
+            grid[r][c] = '.'
+        if self.__start is not None:
+            grid[self.__start[0]][self.__start[1]] = 'P'
+        return grid
 
-        self.rows = len(lines)
-        self.cols = len(lines[0])
-        self.mazeRaw = lines
+    # Builds the per-cell adjacency table, in (down, up, right, left) order, so that
+    # neighbor lookups during search are a single list index
+    def __buildNeighbors(self):
+        rows, cols = self.rows, self.cols
+        n = rows * cols
+        walls = bytes(self.walls)
+        # blocked[k][cell] is 1 if the move in direction k from cell is off the grid or
+        # into a wall
+        edge = b'\x01' * cols
+        down = walls[cols:] + edge
+        up = edge + walls[:n - cols]
+        right = bytearray(walls[1:] + b'\x01')
+        right[cols - 1::cols] = b'\x01' * rows
+        left = bytearray(b'\x01' + walls[:n - 1])
+        left[::cols] = b'\x01' * rows
+        # every byte is 0 or 1, so the four masks are packed into one 4-bit code per
+        # cell with big integer shifts, without a carry ever crossing into the next byte
+        whole = lambda b: int.from_bytes(b, 'little')
+        codes = (whole(down) | whole(up) << 1 | whole(right) << 2 | whole(left) << 3).to_bytes(n, 'little')
+        offsets = (cols, -cols, 1, -1)
+        adders = [_offsetAdder([offsets[k] for k in range(4) if not code >> k & 1]) for code in range(16)]
+        self.__cellNeighbors = [adders[code](cell) for cell, code in enumerate(codes)]
 
-        if (len(self.mazeRaw) != self.rows) or (len(self.mazeRaw[0]) != self.cols):
-            print("Maze dimensions incorrect")
-            raise SystemExit
-            return
+    # Builds the corridor graph: dead-end branches without the start or an objective
+    # are pruned, then every run of corridor cells between two junctions, the start
+    # or objectives is collapsed into one weighted edge
+    def __buildCorridorGraph(self):
+        cols = self.cols
+        table = self.__cellNeighbors
+        keep = set(r * cols + c for r, c in self.__objective)
+        if self.__start is not None:
+            keep.add(self.__start[0] * cols + self.__start[1])
 
-        for row in range(len(self.mazeRaw)):
-            for col in range(len(self.mazeRaw[0])):
-                if self.mazeRaw[row][col] == self.__startChar:
-                    self.__start = (row, col)
-                elif self.mazeRaw[row][col] == self.__objectiveChar:
-                    self.__objective.append((row, col))
+        degree = [len(ns) for ns in table]
+        removed = bytearray(self.walls)
+        stack = [cell for cell in range(len(table)) if degree[cell] <= 1 and not removed[cell] and cell not in keep]
+        while stack:
+            cell = stack.pop()
+            if removed[cell]:
+                continue
+            removed[cell] = 1
+            for n in table[cell]:
+                degree[n] -= 1
+                if not removed[n] and degree[n] <= 1 and n not in keep:
+                    stack.append(n)
+
+        nodes = [cell for cell in range(len(table)) if not removed[cell] and (degree[cell] != 2 or cell in keep)]
+        isNode = set(nodes)
+        graph = {}
+        for node in nodes:
+            edges = {}
+            for n in table[node]:
+                if removed[n]:
+                    continue
+                if n in isNode:
+                    edges[n] = (1, ())
+                    continue
+                prev, cur = node, n
+                between = []
+                while cur not in isNode:
+                    between.append(cur)
+                    for m in table[cur]:
+                        if m != prev and not removed[m]:
+                            prev, cur = cur, m
+                            break
+                if cur != node and (cur not in edges or len(between) + 1 < edges[cur][0]):
+                    edges[cur] = (len(between) + 1, tuple(between))
+            graph[node] = edges
+        self.__graph = graph
 
     # Returns True if the given position is the location of a wall
     def isWall(self, row, col):
-        return self.mazeRaw[row][col] == self.__wallChar
+        return self.walls[row * self.cols + col] == 1
 
     # Rturns True if the given position is the location of an objective
     def isObjective(self, row, col):
-        return (row, col) in self.__objective
+        return (row, col) in self.__objectiveSet
 
     # Returns the start position as a tuple of (row, column)
     def getStart(self):
@@ -64,6 +178,7 @@ class Maze:
 
     def setStart(self, start):
         self.__start = start
+        self.__graph = None
 
     # Returns the dimensions of the maze as a (row, column) tuple
     def getDimensions(self):
@@ -71,11 +186,13 @@ class Maze:
 
     # Returns the list of objective positions of the maze
     def getObjectives(self):
-        return copy.deepcopy(self.__objective)
+        return list(self.__objective)
 
 
     def setObjectives(self, objectives):
         self.__objective = objectives
+        self.__objectiveSet = set(objectives)
+        self.__graph = None
 
 
     def getStatesExplored(self):
@@ -85,21 +202,41 @@ class Maze:
     def isValidMove(self, row, col):
         return row >= 0 and row < self.rows and col >= 0 and col < self.cols and not self.isWall(row, col)
 
-    # Returns list of neighboing squares that can be moved to from the given row,col
+    # Returns the neighboring squares that can be moved to from the given row,col
+    # as a precomputed tuple
     def getNeighbors(self, row, col):
-        possibleNeighbors = [
-            (row + 1, col),
-            (row - 1, col),
-            (row, col + 1),
-            (row, col - 1)
-        ]
-        neighbors = []
-        for r, c in possibleNeighbors:
-            if self.isValidMove(r,c):
-                neighbors.append((r,c))
         self.__states_explored += 1
-        return neighbors
+        return self.__neighbors[row * self.cols + col]
+
+    # Same as getNeighbors, but takes and returns flat (row * cols + col) cell indices
+    def getCellNeighbors(self, cell):
+        self.__states_explored += 1
+        return self.__cellNeighbors[cell]
+
+    # Returns the whole flat-cell adjacency table, for preprocessing that should
+    # not be counted as explored states
+    def getCellNeighborTable(self):
+        return self.__cellNeighbors
+
+    # Returns the corridor graph, built on first use, as a dict from each node's flat
+    # cell index to {neighbor node: (length, flat cells strictly between them)}.
+    # Nodes are the start, the objectives and the junctions and dead ends left after
+    # pruning; building it is not counted as explored states
+    def getCorridorGraph(self):
+        if self.__graph is None:
+            self.__buildCorridorGraph()
+        return self.__graph
 
+    # Returns the corridor graph edges leaving the given node, see getCorridorGraph
+    def getGraphNeighbors(self, cell):
+        self.__states_explored += 1
+        return self.getCorridorGraph()[cell]
+
+    # Returns "Valid" if the path is a valid solution of the maze, and otherwise the
+    # first of these errors it has: bad shape, a move that is not a single step, a
+    # move into a wall or off the grid, an objective never visited, an end that is not
+    # an objective, or a cell visited again with no objective reached in between.
+    # Runs in linear time; long paths are checked with NumPy when it is installed
     def isValidPath(self, path):
         # check if path is in correct shape (type, not empty)
         if not isinstance(path, list):
@@ -114,39 +251,93 @@ class Maze:
         if len(path[0]) != 2:
             return "position must be (x, y)"
 
-        # check single hop
-        for i in range(1, len(path)):
-            prev = path[i-1]
-            cur = path[i]
-            dist = abs((prev[1]-cur[1])+(prev[0]-cur[0]))
-            if dist > 1:
-                return "Not single hop"
+        if len(path) >= VECTORIZE_MIN_PATH and _loadNumpy():
+            verdict = self.__isValidPathArray(path)
+            if verdict is not None:
+                return verdict
 
-        # check whether it is valid move
+        rows, cols = self.rows, self.cols
+        walls = self.walls
+        objectives = self.__objectiveSet
+        # lastCount[pos]: number of objective cells on the path up to the last visit to pos
+        # revisited[pos]: True once two successive visits to pos have an objective between them
+        lastCount = {}
+        revisited = {}
+        count = 0
+        validMoves = True
+        prev = path[0]
         for pos in path:
-            if not self.isValidMove(pos[0], pos[1]):
-                return "Not valid move"
+            row, col = pos[0], pos[1]
+            # check single hop
+            if abs(row - prev[0]) + abs(col - prev[1]) > 1:
+                return "Not single hop"
+            prev = pos
+            # check whether it is valid move
+            if validMoves and not (0 <= row < rows and 0 <= col < cols and not walls[row * cols + col]):
+                validMoves = False
+            # check for duplication against the previous visit
+            if pos in lastCount:
+                revisited[pos] = revisited.get(pos, False) or count > lastCount[pos]
+            if pos in objectives:
+                count += 1
+            lastCount[pos] = count
+
+        if not validMoves:
+            return "Not valid move"
 
         # check whether it passes all goals
-        if not set(self.__objective).issubset(set(path)):
+        if not objectives.issubset(lastCount):
             return "Not all goals passed"
 
         # check whether it ends up at one of goals
-        if not path[-1] in self.__objective:
+        if not path[-1] in objectives:
             return "Last position is not goal"
 
-        # check for duplication
-        if len(set(path)) != len(path):
-            c = Counter(path)
-            dup_dots = [p for p in set(c.elements()) if c[p] >= 2]
-            for p in dup_dots:
-                indices = [i for i, dot in enumerate(path) if dot == p]
-                is_dup = True
-                for i in range(len(indices) - 1):
-                    for dot in path[indices[i]+1: indices[i + 1]]:
-                        if self.isObjective(dot[0], dot[1]):
-                            is_dup = False
-                            break
-                if is_dup:
-                    return "Unnecessary path detected"
+        if not all(revisited.values()):
+            return "Unnecessary path detected"
+        return "Valid"
+
+    # Same checks as isValidPath after the shape checks, on NumPy arrays. Returns None
+    # if some position is not a pair of integers, so that the loop is used instead
+    def __isValidPathArray(self, path):
+        if set(map(len, path)) != {2}:
+            return None
+        try:
+            points = np.fromiter(chain.from_iterable(path), dtype=np.int64, count=2 * len(path))
+        except (TypeError, ValueError):
+            return None
+        rows, cols = self.rows, self.cols
+        row, col = points[0::2], points[1::2]
+
+        if (np.abs(np.diff(row)) + np.abs(np.diff(col)) > 1).any():
+            return "Not single hop"
+
+        if not ((row >= 0) & (row < rows) & (col >= 0) & (col < cols)).all():
+            return "Not valid move"
+        cells = row * cols + col
+        if np.frombuffer(self.walls, dtype=np.uint8)[cells].any():
+            return "Not valid move"
+
+        isObjective = np.zeros(rows * cols, dtype=bool)
+        goalCells = np.array([r * cols + c for r, c in self.__objectiveSet], dtype=np.int64)
+        isObjective[goalCells] = True
+        onGoal = isObjective[cells]
+        if np.unique(cells[onGoal]).size != goalCells.size:
+            return "Not all goals passed"
+
+        if not onGoal[-1]:
+            return "Last position is not goal"
+
+        # successive visits to a cell are neighbors once the visits are sorted by cell;
+        # before[k] is the number of objective cells in path[:k]
+        before = np.concatenate(([0], np.cumsum(onGoal)))
+        order = np.argsort(cells, kind="stable")
+        sortedCells = cells[order]
+        again = sortedCells[1:] == sortedCells[:-1]
+        first, second = order[:-1][again], order[1:][again]
+        repeated = sortedCells[1:][again]
+        separated = np.zeros(rows * cols, dtype=bool)
+        separated[repeated[before[second] - before[first + 1] > 0]] = True
+        if not separated[repeated].all():
+            return "Unnecessary path detected"
         return "Valid"
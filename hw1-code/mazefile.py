@@ -0,0 +1,139 @@
+# mazefile.py
+# ---------------
+"""
+This file contains the maze file readers and the binary maze writer. Text
+mazes are parsed as bytes in one pass: the wall mask comes from a single
+translate over the joined rows, and the start and objectives from find, so
+no Python code runs per cell. The binary format stores that parse directly,
+and its wall mask is memory-mapped rather than read, so even a huge maze
+loads in near-constant time. Run this file to convert text mazes.
+
+Binary layout, little endian:
+    header      magic b'MAZB', version u16, rows u32, cols u32,
+                start row i32, start col i32 (-1 if none), objective count u32
+    objectives  count * (row u32, col u32), in text order
+    walls       rows * cols bytes, row major, 1 for a wall and 0 otherwise
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+
+WALL = ord('%')
+START = b'P'
+OBJECTIVE = b'.'
+
+MAGIC = b'MAZB'
+VERSION = 1
+
+BINARY_EXTENSION = '.mazb'
+
+# The file extensions of maze files, for tools that look for mazes in directories
+EXTENSIONS = ('.txt', BINARY_EXTENSION)
+HEADER = struct.Struct('<4sHIIiiI')
+
+# Maps every byte to 1 if it is the wall character and 0 otherwise
+WALL_TABLE = bytes(1 if b == WALL else 0 for b in range(256))
+
+def read_text(filename):
+    """
+    Parses a text maze. Lines that are only whitespace are skipped, and characters
+    past the width of the first row are ignored.
+
+    @return rows, cols: the dimensions
+    @return walls: a bytearray of rows * cols flags, 1 for walls
+    @return start: the (row, col) of the last 'P', or None
+    @return objectives: the (row, col) of every '.', in row-major order
+    @return lines: the rows as bytes, as read
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    lines = [line for line in data.split(b'\n') if line.strip()]
+    if not lines:
+        raise ValueError("Maze is empty")
+    rows, cols = len(lines), len(lines[0])
+    if any(len(line) < cols for line in lines):
+        raise ValueError("Maze dimensions incorrect")
+
+    grid = b''.join(line[:cols] for line in lines)
+    walls = bytearray(grid.translate(WALL_TABLE))
+    k = grid.rfind(START)
+    start = divmod(k, cols) if k >= 0 else None
+    objectives = []
+    k = grid.find(OBJECTIVE)
+    while k >= 0:
+        objectives.append(divmod(k, cols))
+        k = grid.find(OBJECTIVE, k + 1)
+    return rows, cols, walls, start, objectives, lines
+
+def read_binary(filename):
+    """
+    Opens a binary maze. Same results as read_text, except that walls is a read-only
+    memoryview over the mapped file and lines is None.
+    """
+    with open(filename, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise ValueError("Truncated maze file")
+    magic, version, rows, cols, start_row, start_col, count = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version %d binary maze" % VERSION)
+    offset = HEADER.size + 8 * count
+    if len(mapped) < offset + rows * cols:
+        raise ValueError("Truncated maze file")
+
+    coords = array('I')
+    coords.frombytes(mapped[HEADER.size:offset])
+    if sys.byteorder != 'little':
+        coords.byteswap()
+    objectives = list(zip(coords[0::2], coords[1::2]))
+    start = (start_row, start_col) if start_row >= 0 else None
+    walls = memoryview(mapped)[offset:offset + rows * cols]
+    return rows, cols, walls, start, objectives, None
+
+def read_maze(filename):
+    # Reads a binary or text maze, telling them apart by the magic bytes
+    with open(filename, 'rb') as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return read_binary(filename)
+    return read_text(filename)
+
+def write_binary(maze, filename):
+    """
+    Writes a maze in the binary format.
+
+    @param maze: a Maze, from a text or binary file
+    @param filename: the file to write
+    """
+    rows, cols = maze.getDimensions()
+    start = maze.getStart() or (-1, -1)
+    objectives = maze.getObjectives()
+    coords = array('I', [v for pos in objectives for v in pos])
+    if sys.byteorder != 'little':
+        coords.byteswap()
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, start[0], start[1], len(objectives)))
+        f.write(coords.tobytes())
+        f.write(maze.walls)
+
+if __name__ == "__main__":
+    from maze import Maze
+
+    parser = argparse.ArgumentParser(description='HW1 Maze Converter')
+
+    parser.add_argument('inputs', nargs='+',
+                        help='text maze files to convert [REQUIRED]')
+    parser.add_argument('--outdir', dest="outdir", type=str, default = None,
+                        help='directory for the .mazb files - default next to each input')
+
+    args = parser.parse_args()
+    for filename in args.inputs:
+        base = os.path.splitext(filename)[0] + BINARY_EXTENSION
+        out = base if args.outdir is None else os.path.join(args.outdir, os.path.basename(base))
+        write_binary(Maze(filename), out)
+        print("%s -> %s" % (filename, out))
@@ -0,0 +1,118 @@
+# render.py
+# ---------------
+"""
+This file contains the array rendering backend. A whole frame (walls, the
+path in its color gradient, the start and the objectives) is built as one
+NumPy RGB array: cells are colored on a rows x cols grid and scaled up with
+repeat, and the markers are stamped into every block at once through a
+blocked view of the frame. hw1.py shows the frame with a single blit, and
+write_png saves it without pygame or a window, which is what batch.py uses
+to export images.
+
+NumPy is optional. Without it, available is False and hw1.py draws the maze
+cell by cell with pygame.
+"""
+
+import zlib
+import struct
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None
+
+SCALE = 20
+
+BACKGROUND = (255, 255, 255)
+WALL_COLOR = (0, 0, 0)
+START_COLOR = (0, 0, 255)
+OBJECTIVE_COLOR = (0, 0, 0)
+
+# First and last color of the path gradient, as in hw1.Application.getColor
+PATH_COLORS = ((255, 0, 0), (0, 255, 0))
+
+# zlib level of write_png; frames are mostly flat colors, so a low level already
+# compresses them well
+PNG_LEVEL = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Returns True if write_png can save to filename
+def can_export(filename):
+    return available and filename.lower().endswith(".png")
+
+# Returns the pixels of a block of the given size covered by an objective marker,
+# a disk of radius size / 4 around the block center
+def _disk(size):
+    center, radius = int(size / 2), int(size / 4)
+    y, x = np.ogrid[:size, :size]
+    return np.nonzero((y - center) ** 2 + (x - center) ** 2 <= radius * radius)
+
+def render_frame(maze, path=(), scale=SCALE, colors=PATH_COLORS):
+    """
+    Draws a maze and a path as they appear in the hw1.py window.
+
+    @param maze: a Maze
+    @param path: a list of (row, col) tuples, colored from colors[0] to colors[1]
+    @param scale: pixels per cell
+    @param colors: the first and last color of the path gradient
+
+    @return frame: a (rows * scale, cols * scale, 3) uint8 array
+    """
+    rows, cols = maze.getDimensions()
+    cells = np.empty((rows, cols, 3), dtype=np.uint8)
+    cells[:] = BACKGROUND
+    if len(path):
+        coords = np.fromiter(chain.from_iterable(path), dtype=np.intp, count=2 * len(path)).reshape(-1, 2)
+        first, last = np.array(colors, dtype=float)
+        steps = np.arange(len(path), dtype=float)[:, None]
+        cells[coords[:, 0], coords[:, 1]] = first + steps * ((last - first) / len(path))
+    walls = np.frombuffer(maze.walls, dtype=np.uint8).reshape(rows, cols)
+    cells[walls != 0] = WALL_COLOR
+
+    frame = cells.repeat(scale, axis=0).repeat(scale, axis=1)
+    # blocks[row, col] is the scale x scale block of pixels of that cell
+    blocks = frame.reshape(rows, scale, cols, scale, 3).swapaxes(1, 2)
+    start = maze.getStart()
+    if start is not None:
+        offset, size = int(scale / 4), int(scale * 0.5)
+        blocks[start[0], start[1], offset:offset + size, offset:offset + size] = START_COLOR
+    objectives = maze.getObjectives()
+    if objectives:
+        coords = np.array(objectives, dtype=np.intp)
+        y, x = _disk(scale)
+        blocks[coords[:, 0, None], coords[:, 1, None], y, x] = OBJECTIVE_COLOR
+    return frame
+
+def _chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def write_png(frame, filename, level=PNG_LEVEL):
+    """
+    Saves an RGB frame as a PNG. A row equal to the one above it is stored with the
+    PNG "up" filter, which turns it into zeros, so the repeated rows of a scaled frame
+    cost almost nothing to compress.
+
+    @param frame: a (height, width, 3) uint8 array
+    @param filename: the file to write
+    @param level: the zlib compression level
+    """
+    height, width = frame.shape[:2]
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    repeated = np.zeros(height, dtype=bool)
+    repeated[1:] = (frame[1:] == frame[:-1]).all(axis=(1, 2))
+    raw[repeated, 0] = 2
+    raw[~repeated, 1:] = frame[~repeated].reshape(-1, 3 * width)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    with open(filename, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_chunk(b"IHDR", header))
+        f.write(_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)))
+        f.write(_chunk(b"IEND", b""))
+
+def save_image(maze, path, filename, scale=SCALE, colors=PATH_COLORS):
+    # Renders a maze and path straight to a PNG file
+    write_png(render_frame(maze, path, scale, colors), filename)
@@ -17,19 +17,186 @@ files and classes when code is run, so be careful to not modify anything else.
 # The path should be a list of tuples in the form (row, col) that correspond
 # to the positions of the path taken by your search algorithm.
 # maze is a Maze object based on the maze from the file specified by input filename
-# searchMethod is the search method specified by --method flag (bfs,dfs,astar,astar_multi,fast)
+# searchMethod is the search method specified by --method flag (bfs,dfs,astar,astar_multi,fast,...)
 
-import queue
-import heapq
+import time
+from array import array
+from collections import namedtuple, deque
+
+import wavefront
+from wavefront import descend
+from distance import DistanceTable
+from cache import load_tables, save_tables, maze_digest, LRUCache
+from frontier import StateStore, OpenList
+from tour import nearest_neighbor_tour, improve_tour, held_karp_tour
+
+# Maximum number of objective subsets whose MST weight astar_multi keeps in memory
+MST_CACHE_SIZE = 1 << 18
+
+# The MST memo of the last astar_multi run, kept for heuristic_cache_stats
+mst_cache = None
+
+# Number of distance tables kept in memory, so that solving a maze again in the same
+# process (e.g. in a service.py worker) does not even reach the disk cache; a table
+# only holds its distance matrix
+TABLE_CACHE_SIZE = 4
+
+# The in-memory distance tables, by maze digest
+table_cache = LRUCache(TABLE_CACHE_SIZE)
+
+# The open list of the last A* run, kept for open_list_stats
+open_list = None
+
+# Returns the visited-set size of the last search, for the searches that keep their
+# states elsewhere than in open_list; kept for closed_set_size
+visited_size = None
+
+# Weights of the successive weighted A* passes of anytime_multi_iter
+ANYTIME_WEIGHTS = (5.0, 3.0, 2.0, 1.5, 1.25, 1.0)
+
+# Seconds anytime_multi may spend refining before it returns its best path
+ANYTIME_TIME_LIMIT = 10.0
+
+# Most 2-opt and Or-opt moves fast makes on its tour. The maps converge in under ten
+# (bigSearch in eight, 0.3 s); the cap only bounds pathological inputs, and being a
+# move count rather than a time it keeps the path the same from run to run
+FAST_MAX_MOVES = 1000
+
+# Most objectives held_karp solves with its dynamic program, which takes about 0.1 s
+# at 12 and 2 s at 16, doubling with every objective more; it refuses larger mazes
+HELD_KARP_MAX_OBJECTIVES = 16
+
+def heuristic_cache_stats():
+    """
+    @return stats: hit/miss/eviction counters of the MST memo of the last search, or
+        None if the last search did not use it
+    """
+    if mst_cache is None:
+        return None
+    return mst_cache.stats()
+
+def open_list_stats():
+    """
+    @return stats: push/pop/stale-pop counters and peak size of the open list of the
+        last search, or None if the last search did not use one
+    """
+    if open_list is None:
+        return None
+    return open_list.stats()
+
+def closed_set_size():
+    """
+    @return size: the number of states the last search marked as visited or closed,
+        or stored on its open list, which never shrinks during a search and so is
+        also its peak; the cells reached for wavefront, the largest pass for
+        anytime_multi, and None for fast and held_karp, which search no state space
+    """
+    if visited_size is not None:
+        return visited_size()
+    if open_list is not None:
+        return len(open_list.states)
+    return None
 
 def search(maze, searchMethod):
-    return {
-        "bfs": bfs,
-        "astar": astar,
-        "astar_corner": astar_corner,
-        "astar_multi": astar_multi,
-        "fast": fast,
-    }.get(searchMethod)(maze)
+    global mst_cache, open_list, visited_size
+    mst_cache = None
+    open_list = None
+    visited_size = None
+    return SEARCH_METHODS.get(searchMethod)(maze)
+
+# Progress event of search_iter, one per expanded state. best_f is the largest f
+# popped so far, a lower bound on the optimal cost for the A* methods, and None for
+# methods that have no f.
+Expansion = namedtuple("Expansion", ["position", "frontier", "best_f", "expanded"])
+
+# Last item of search_iter. status is "done", "budget", "deadline" or "cancelled";
+# path is None unless the search is done.
+SearchResult = namedtuple("SearchResult", ["path", "status", "expanded"])
+
+def search_iter(maze, searchMethod, max_expansions=None, deadline=None, cancel=None):
+    """
+    Runs a search step by step. Closing the generator also cancels the search. The
+    limits are checked between steps: one step is one expanded state for the graph
+    searches and one wavefront for wavefront. fast and held_karp take their first step
+    once the distance table of actual_cost_table is built, and anytime_multi once fast
+    has found its first path, so these preparations cannot be cut short.
+
+    @param maze: The maze to execute the search on.
+    @param searchMethod: a key of SEARCH_METHODS
+    @param max_expansions: stop after this many expanded states, None for no limit
+    @param deadline: stop once time.monotonic() reaches this value, None for no limit
+    @param cancel: an object with is_set(), e.g. a threading.Event, that stops the
+        search when set
+
+    @return events: a generator of Expansion events, ending with one SearchResult
+    """
+    global mst_cache, open_list, visited_size
+    mst_cache = None
+    open_list = None
+    visited_size = None
+    steps = SEARCH_STEPS[searchMethod](maze)
+    cols = maze.getDimensions()[1]
+    expanded = 0
+    best_f = None
+    status = None
+    try:
+        while status is None:
+            try:
+                cell, frontier, f = next(steps)
+            except StopIteration as done:
+                yield SearchResult(done.value, "done", expanded)
+                return
+            expanded += 1
+            if f is not None and (best_f is None or f > best_f):
+                best_f = f
+            yield Expansion(divmod(cell, cols), frontier, best_f, expanded)
+            if max_expansions is not None and expanded >= max_expansions:
+                status = "budget"
+            elif deadline is not None and time.monotonic() >= deadline:
+                status = "deadline"
+            elif cancel is not None and cancel.is_set():
+                status = "cancelled"
+    finally:
+        steps.close()
+    yield SearchResult(None, status, expanded)
+
+def index_objectives(maze):
+    """
+    Indexes the objectives of the maze once, so that a search state can hold the
+    set of remaining objectives as an integer bitmask instead of a tuple. A state
+    is packed into a single int, mask * (rows * cols) + cell, where cell is the
+    flat row * cols + col index of the position.
+
+    @param maze: The maze to index.
+
+    @return objs: the list of objective positions, bit i of a mask stands for objs[i]
+    @return obj_bits: a dict from the flat cell index of each objective to its bit
+    """
+    cols = maze.getDimensions()[1]
+    objs = maze.getObjectives()
+    obj_bits = {}
+    for i, (r, c) in enumerate(objs):
+        obj_bits[r * cols + c] = 1 << i
+    return objs, obj_bits
+
+def mask_indices(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def state_path(states, ncells, cols):
+    return [divmod(state % ncells, cols) for state in states]
+
+def run_steps(steps):
+    # Drives a step generator to the end and returns its path. search() makes the
+    # generators with events=False, so the graph searches never yield and finish in
+    # the first next() call, without a generator round trip per expanded state
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
 
 def bfs(maze):
     """
@@ -39,36 +206,37 @@ def bfs(maze):
 
     @return path: a list of tuples containing the coordinates of each state in the computed path
     """
+    return run_steps(bfs_steps(maze, events=False))
+
+def bfs_steps(maze, events=True):
+    """
+    Step generator of bfs: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
     # TODO: Write your code here
-    q = queue.Queue()
-    visited = set()
-    bfspath = {}
-    objs = maze.getObjectives()
+    global visited_size
+    q = deque()
+    store = StateStore()
+    visited_size = lambda: len(store.states)
+    rows, cols = maze.getDimensions()
+    ncells = rows * cols
+    objs, obj_bits = index_objectives(maze)
     start = maze.getStart()
-    init_state = (start, tuple(objs))
-    visited.add(init_state)
-    q.put(init_state)
-    while not q.empty():
-        state = q.get()
-        if state[1] == ():
+    i = store.add(((1 << len(objs)) - 1) * ncells + start[0] * cols + start[1])
+    q.append(i)
+    while q:
+        i = q.popleft()
+        mask, cell = divmod(store.states[i], ncells)
+        if mask == 0:
             break
-        for i in maze.getNeighbors(state[0][0], state[0][1]):
-            tmp_objs = list(state[1])
-            if i in tmp_objs:
-                tmp_objs.remove(i)
-            s = (i, tuple(tmp_objs))
-            if s not in visited:
-                visited.add(s)
-                q.put(s)
-                bfspath[s] = state
-    path = []
-    while state != init_state:
-        path.append(state[0])
-        state = bfspath[state]
-    path.append(maze.getStart())
-    path.reverse()
+        if events:
+            yield cell, len(q), None
+        for n in maze.getCellNeighbors(cell):
+            s = (mask & ~obj_bits.get(n, 0)) * ncells + n
+            if s not in store.ids:
+                q.append(store.add(s, i))
 
-    return path
+    return state_path(store.trace(i), ncells, cols)
 
 def manhattan_distance(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
@@ -81,34 +249,280 @@ def astar(maze):
 
     @return path: a list of tuples containing the coordinates of each state in the computed path
     """
+    return run_steps(astar_steps(maze, events=False))
+
+def astar_steps(maze, events=True):
+    """
+    Step generator of astar: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
     # TODO: Write your code here
-    state_queue = []
-    heapq.heapify(state_queue)
-    visited = set()
+    global open_list
+    open_list = OpenList()
+    rows, cols = maze.getDimensions()
     obj = maze.getObjectives()[0]
+    obj_cell = obj[0] * cols + obj[1]
     start = maze.getStart()
-    init_state = (manhattan_distance(start, obj), start, 0)
-    heapq.heappush(state_queue, init_state)
-    astarpath = {}
-    while state_queue:
-        state = heapq.heappop(state_queue)
-        if state[1] == obj:
+    open_list.push(start[0] * cols + start[1], 0, manhattan_distance(start, obj))
+    while open_list:
+        i, cell, g = open_list.pop()
+        if cell == obj_cell:
             break
-        visited.add(state[1])
-        for i in maze.getNeighbors(state[1][0], state[1][1]):
-            if i not in visited:
-                s = (manhattan_distance(i, obj) + state[2] + 1, i, state[2] + 1)
-                heapq.heappush(state_queue, s)
-                astarpath[s] = state
-    path = []
-    while state != init_state:
-        path.append(state[1])
-        state = astarpath[state]
-    path.append(start)
+        if events:
+            yield cell, len(open_list), open_list.last_f
+        for n in maze.getCellNeighbors(cell):
+            if open_list.improves(n, g + 1):
+                open_list.push(n, g + 1, manhattan_distance(divmod(n, cols), obj), i)
+
+    return state_path(open_list.trace(i), rows * cols, cols)
+
+def parent_chain(parent, cell):
+    chain = []
+    while cell != -1:
+        chain.append(cell)
+        cell = parent[cell]
+    return chain
+
+def bibfs(maze):
+    """
+    Runs bidirectional BFS between the start and the first objective. Each round
+    expands one whole level of the smaller frontier, and the shortest connection
+    found in that level is optimal.
+
+    @param maze: The maze to execute the search on.
+
+    @return path: a list of tuples containing the coordinates of each state in the computed path
+    """
+    return run_steps(bibfs_steps(maze, events=False))
+
+def bibfs_steps(maze, events=True):
+    """
+    Step generator of bibfs: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
+    global visited_size
+    rows, cols = maze.getDimensions()
+    ncells = rows * cols
+    start = maze.getStart()
+    obj = maze.getObjectives()[0]
+    source = start[0] * cols + start[1]
+    target = obj[0] * cols + obj[1]
+    if source == target:
+        return [start]
+    dist = (array('l', [-1]) * ncells, array('l', [-1]) * ncells)
+    parent = (array('l', [-1]) * ncells, array('l', [-1]) * ncells)
+    dist[0][source] = 0
+    dist[1][target] = 0
+    visited_size = lambda: 2 * ncells - dist[0].count(-1) - dist[1].count(-1)
+    frontiers = [[source], [target]]
+    best, meet = None, None
+    while frontiers[0] and frontiers[1] and best is None:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        d, p, other = dist[side], parent[side], dist[1 - side]
+        next_frontier = []
+        for cell in frontiers[side]:
+            if events:
+                yield cell, len(frontiers[0]) + len(frontiers[1]) + len(next_frontier), None
+            for n in maze.getCellNeighbors(cell):
+                if other[n] != -1 and (best is None or d[cell] + 1 + other[n] < best):
+                    best = d[cell] + 1 + other[n]
+                    meet = (cell, n) if side == 0 else (n, cell)
+                if d[n] == -1:
+                    d[n] = d[cell] + 1
+                    p[n] = cell
+                    next_frontier.append(n)
+        frontiers[side] = next_frontier
+    if meet is None:
+        return []
+    return state_path(meeting_path(parent, meet), ncells, cols)
+
+def meeting_path(parent, meet):
+    # The cells of a bibfs path, from the start side's parent chain through the meeting
+    # edge meet and down the target side's chain
+    path = parent_chain(parent[0], meet[0])
     path.reverse()
+    path += parent_chain(parent[1], meet[1])
+    return path
+
+# Move directions of jps, in Maze.getNeighbors order
+JPS_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Arrival direction of the jps start state, which has not moved yet
+JPS_NO_MOVE = len(JPS_DIRECTIONS)
+
+def jps(maze):
+    """
+    Runs Jump Point Search (4-connected variant) between the start and the first
+    objective.
+
+    Among equally short paths only canonical ones are followed: vertical moves may
+    turn horizontal anywhere, but horizontal moves only turn vertical where the
+    cell behind the turn is blocked (a forced neighbor). Straight runs are jumped
+    over, so only the cells where a canonical path can turn are pushed. A search
+    state is a (cell, arrival direction) pair, as the allowed turns depend on it.
+
+    @param maze: The maze to execute the search on.
 
+    @return path: a list of tuples containing the coordinates of each state in the computed path
+    """
+    return run_steps(jps_steps(maze, events=False))
+
+def jps_steps(maze, events=True):
+    """
+    Step generator of jps: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
+    global open_list
+    rows, cols = maze.getDimensions()
+    walls = maze.walls
+    start = maze.getStart()
+    obj = maze.getObjectives()[0]
+    target = obj[0] * cols + obj[1]
+
+    def is_open(r, c):
+        return 0 <= r < rows and 0 <= c < cols and not walls[r * cols + c]
+
+    def jump_horizontal(r, c, dc):
+        while True:
+            c += dc
+            if not is_open(r, c):
+                return None
+            if (r, c) == obj:
+                return (r, c)
+            if (is_open(r + 1, c) and not is_open(r + 1, c - dc)) or (is_open(r - 1, c) and not is_open(r - 1, c - dc)):
+                return (r, c)
+
+    def jump_vertical(r, c, dr):
+        while True:
+            r += dr
+            if not is_open(r, c):
+                return None
+            if (r, c) == obj or jump_horizontal(r, c, 1) is not None or jump_horizontal(r, c, -1) is not None:
+                return (r, c)
+
+    # vertical entries last, so they win when cols == 1
+    step_direction = {1: 2, -1: 3, cols: 0, -cols: 1}
+    open_list = OpenList()
+    open_list.push((start[0] * cols + start[1]) * 5 + JPS_NO_MOVE, 0, manhattan_distance(start, obj))
+    while open_list:
+        i, state, g = open_list.pop()
+        cell, d = divmod(state, 5)
+        if cell == target:
+            break
+        if events:
+            yield cell, len(open_list), open_list.last_f
+        r, c = divmod(cell, cols)
+        if d == JPS_NO_MOVE:
+            moves = (0, 1, 2, 3)
+        elif d < 2:
+            moves = (d, 2, 3)
+        else:
+            dc = JPS_DIRECTIONS[d][1]
+            moves = [d] + [v for v in (0, 1) if is_open(r + JPS_DIRECTIONS[v][0], c) and not is_open(r + JPS_DIRECTIONS[v][0], c - dc)]
+        for n in maze.getCellNeighbors(cell):
+            nd = step_direction[n - cell]
+            if nd not in moves:
+                continue
+            dr, dc = JPS_DIRECTIONS[nd]
+            point = jump_vertical(r, c, dr) if dr else jump_horizontal(r, c, dc)
+            if point is None:
+                continue
+            s = (point[0] * cols + point[1]) * 5 + nd
+            ng = g + abs(point[0] - r) + abs(point[1] - c)
+            if open_list.improves(s, ng):
+                open_list.push(s, ng, manhattan_distance(point, obj), i)
+    if cell != target:
+        return []
+
+    return jump_path(open_list.trace(i), cols)
+
+def jump_path(states, cols):
+    # Fills in the straight runs between the jump points of a jps path
+    path = [divmod(states[0] // 5, cols)]
+    for state in states[1:]:
+        r, c = divmod(state // 5, cols)
+        dr, dc = JPS_DIRECTIONS[state % 5]
+        while path[-1] != (r, c):
+            path.append((path[-1][0] + dr, path[-1][1] + dc))
     return path
 
+def corridor(maze):
+    """
+    Runs A star between the start and the first objective on the maze's corridor
+    graph, where dead ends are pruned and corridors are single weighted edges, and
+    expands the node path back into cells. Only graph nodes count as explored states.
+
+    @param maze: The maze to execute the search on.
+
+    @return path: a list of tuples containing the coordinates of each state in the computed path
+    """
+    return run_steps(corridor_steps(maze, events=False))
+
+def corridor_steps(maze, events=True):
+    """
+    Step generator of corridor: yields (cell, frontier size, f) for every expanded
+    graph node and returns the path.
+    """
+    global open_list
+    open_list = OpenList()
+    rows, cols = maze.getDimensions()
+    obj = maze.getObjectives()[0]
+    obj_cell = obj[0] * cols + obj[1]
+    start = maze.getStart()
+    graph = maze.getCorridorGraph()
+    open_list.push(start[0] * cols + start[1], 0, manhattan_distance(start, obj))
+    while open_list:
+        i, cell, g = open_list.pop()
+        if cell == obj_cell:
+            break
+        if events:
+            yield cell, len(open_list), open_list.last_f
+        for n, (length, _) in maze.getGraphNeighbors(cell).items():
+            if open_list.improves(n, g + length):
+                open_list.push(n, g + length, manhattan_distance(divmod(n, cols), obj), i)
+    if cell != obj_cell:
+        return []
+
+    return corridor_path(graph, open_list.trace(i), cols)
+
+def corridor_path(graph, nodes, cols):
+    # Expands a path over corridor graph nodes into the cells of the corridors between them
+    cells = nodes[:1]
+    for a, b in zip(nodes, nodes[1:]):
+        cells.extend(graph[a][b][1])
+        cells.append(b)
+    return [divmod(cell, cols) for cell in cells]
+
+def wavefront_bfs(maze):
+    """
+    Finds a shortest path between the start and the first objective by computing the
+    start's distance field with the vectorized wavefront engine, until it reaches the
+    objective, and walking down it from the objective. Falls back to bfs when NumPy
+    is not installed. The field is computed in bulk, so no states are counted as
+    explored.
+
+    @param maze: The maze to execute the search on.
+
+    @return path: a list of tuples containing the coordinates of each state in the computed path
+    """
+    return run_steps(wavefront_steps(maze, events=False))
+
+def wavefront_steps(maze, events=True):
+    """
+    Step generator of wavefront_bfs: yields (cell, wavefront size, distance) for every
+    wavefront and returns the path.
+    """
+    global visited_size
+    if not wavefront.available:
+        return (yield from bfs_steps(maze, events))
+    cols = maze.getDimensions()[1]
+    start = maze.getStart()
+    obj = maze.getObjectives()[0]
+    field = yield from wavefront.field_steps(wavefront.open_grid(maze), start, obj)
+    visited_size = lambda: int((field != wavefront.UNREACHABLE).sum())
+    path = descend(field, obj[0] * cols + obj[1], cols)
+    return path[::-1] if path is not None else []
+
 def heuristic_corner(a, b_list):
     tmp = b_list.copy()
     if len(tmp) == 0:
@@ -125,95 +539,102 @@ def astar_corner(maze):
 
     @return path: a list of tuples containing the coordinates of each state in the computed path
         """
+    return run_steps(astar_corner_steps(maze, events=False))
+
+def astar_corner_steps(maze, events=True):
+    """
+    Step generator of astar_corner: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
     # TODO: Write your code here
-    state_queue = []
-    heapq.heapify(state_queue)
-    visited = set()
-    objs = maze.getObjectives()
+    global open_list
+    open_list = OpenList()
+    rows, cols = maze.getDimensions()
+    ncells = rows * cols
+    objs, obj_bits = index_objectives(maze)
     start = maze.getStart()
-    init_state = (heuristic_corner(start, objs), start, tuple(objs), 0)
-    heapq.heappush(state_queue, init_state)
-    astarpath = {}
-    while state_queue:
-        state = heapq.heappop(state_queue)
-        if state[2] == ():
+    full_mask = (1 << len(objs)) - 1
+    open_list.push(full_mask * ncells + start[0] * cols + start[1], 0, heuristic_corner(start, objs))
+    while open_list:
+        i, state, g = open_list.pop()
+        mask, cell = divmod(state, ncells)
+        if mask == 0:
             break
-        visited.add((state[1], state[2]))
-        for i in maze.getNeighbors(state[1][0], state[1][1]):
-            tmp_objs = list(state[2])
-            if i in tmp_objs:
-                tmp_objs.remove(i)
-            s = (heuristic_corner(i, tmp_objs) + state[3] + 1, i, tuple(tmp_objs), state[3] + 1)
-            if (s[1], s[2]) not in visited:
-                heapq.heappush(state_queue, s)
-                astarpath[s] = state
-    path = []
-    while state != init_state:
-        path.append(state[1])
-        state = astarpath[state]
-    path.append(start)
-    path.reverse()
-
-    return path
-
-def find_parent(parent, node):
-    if parent[node] == node:
-        return node
-    parent[node] = find_parent(parent, parent[node])
-    return parent[node]
-
-def union(parent, rank, x, y):
-    x_root = find_parent(parent, x)
-    y_root = find_parent(parent, y)
+        if events:
+            yield cell, len(open_list), open_list.last_f
+        for n in maze.getCellNeighbors(cell):
+            n_mask = mask & ~obj_bits.get(n, 0)
+            s = n_mask * ncells + n
+            if open_list.improves(s, g + 1):
+                h = heuristic_corner(divmod(n, cols), [objs[k] for k in mask_indices(n_mask)])
+                open_list.push(s, g + 1, h, i)
 
-    if rank[x_root] < rank[y_root]:
-        parent[x_root] = y_root
-    elif rank[x_root] > rank[y_root]:
-        parent[y_root] = x_root
-    else:
-        parent[y_root] = x_root
-        rank[x_root] += 1
+    return state_path(open_list.trace(i), ncells, cols)
 
 def cal_mst(nodes, cost_table):
-    edges = []
-    n = len(nodes)
-    for i in range(n):
-        for j in range(i + 1, n):
-            edges.append((nodes[i], nodes[j], cost_table[(nodes[i], nodes[j])]))
-
-    edges.sort(key=lambda x: x[2])  # Sort edges by weight
-    parent = {node: node for node in nodes}
-    rank = {node: 0 for node in nodes}
+    # Prim's algorithm on the dense distance matrix: O(n^2) per subset, no edge sorting
+    rest = list(nodes[1:])
+    if not rest:
+        return 0
+    first = cost_table[nodes[0]]
+    best = [first[v] for v in rest]
     total_weight = 0
-
-    for edge in edges:
-        node1, node2, weight = edge
-        if find_parent(parent, node1) != find_parent(parent, node2):
-            total_weight += weight
-            union(parent, rank, node1, node2)
+    while rest:
+        k = min(range(len(best)), key=best.__getitem__)
+        total_weight += best[k]
+        u = rest[k]
+        rest[k] = rest[-1]
+        best[k] = best[-1]
+        rest.pop()
+        best.pop()
+        row = cost_table[u]
+        for i, v in enumerate(rest):
+            if row[v] < best[i]:
+                best[i] = row[v]
 
     return total_weight
 
-def heuristic_multi(a, b_list, mst_dict, cost_table):
-    if len(b_list) == 0:
+def heuristic_multi(a, mask, objs, mst_cache, cost_table):
+    if mask == 0:
         return 0
-    if tuple(b_list) not in mst_dict:
-        mst_dict[tuple(b_list)] = cal_mst(b_list, cost_table)
-    return min([manhattan_distance(a, b) for b in b_list]) + mst_dict[tuple(b_list)]
+    weight = mst_cache.get(mask)
+    if weight is None:
+        weight = cal_mst([k + 1 for k in mask_indices(mask)], cost_table)
+        mst_cache.put(mask, weight)
+    return min([manhattan_distance(a, objs[k]) for k in mask_indices(mask)]) + weight
 
 def actual_cost_table(maze):
-    objs = maze.getObjectives()
-    start = maze.getStart()
-    cost_table = {}
-    n = len(objs)
-    for i in range(n):
-        for j in range(i + 1, n):
-            maze.setObjectives([objs[j]])
-            maze.setStart(objs[i])
-            cost_table[(objs[i], objs[j])] = len(astar(maze)) - 1
-    maze.setStart(start)
-    maze.setObjectives(objs)
-    return cost_table
+    """
+    Computes the true maze distance between every pair of objectives and the start.
+
+    @param maze: The maze to compute the distances on. It is not modified.
+
+    @return cost_table: a DistanceTable; node 0 is the start and node k + 1 is objective k
+    """
+    digest = maze_digest(maze)
+    table = table_cache.get(digest)
+    if table is None:
+        matrix, _ = load_tables(maze)
+        table = DistanceTable(maze, matrix)
+        if matrix is None:
+            save_tables(maze, table.matrix, {})
+        table_cache.put(digest, table)
+    return table
+
+def multi_tables(maze):
+    """
+    Loads or computes the tables the astar_multi heuristic needs.
+
+    @return cost_table: the distance matrix of actual_cost_table
+    @return mst_cache: an LRUCache of MST weights, seeded from the disk cache
+    """
+    cost_table, mst_dict = load_tables(maze)
+    if cost_table is None:
+        table = table_cache.get(maze_digest(maze))
+        if table is None:
+            table = DistanceTable(maze)
+        cost_table = table.matrix
+    return cost_table, LRUCache(MST_CACHE_SIZE, mst_dict.items())
 
 def astar_multi(maze):
     """
@@ -224,70 +645,260 @@ def astar_multi(maze):
 
     @return path: a list of tuples containing the coordinates of each state in the computed path
     """
+    return run_steps(astar_multi_steps(maze, events=False))
+
+def astar_multi_steps(maze, events=True):
+    """
+    Step generator of astar_multi: yields (cell, frontier size, f) for every expanded state
+    and returns the path.
+    """
     # TODO: Write your code here
-    state_queue = []
-    heapq.heapify(state_queue)
-    visited = set()
-    objs = maze.getObjectives()
+    global mst_cache, open_list
+    open_list = OpenList()
+    rows, cols = maze.getDimensions()
+    ncells = rows * cols
+    objs, obj_bits = index_objectives(maze)
     start = maze.getStart()
-    cost_table = actual_cost_table(maze)
-    mst_dict = {}
-    mst_dict[tuple(objs)] = cal_mst(objs, cost_table)
-    init_state = (heuristic_multi(start, objs, mst_dict, cost_table), start, tuple(objs), 0)
-    heapq.heappush(state_queue, init_state)
-    astarpath = {}
-    while state_queue:
-        state = heapq.heappop(state_queue)
-        if state[2] == ():
+    cost_table, mst_cache = multi_tables(maze)
+    full_mask = (1 << len(objs)) - 1
+    h = heuristic_multi(start, full_mask, objs, mst_cache, cost_table)
+    open_list.push(full_mask * ncells + start[0] * cols + start[1], 0, h)
+    while open_list:
+        i, state, g = open_list.pop()
+        mask, cell = divmod(state, ncells)
+        if mask == 0:
             break
-        visited.add((state[1], state[2]))
-        for i in maze.getNeighbors(state[1][0], state[1][1]):
-            tmp_objs = list(state[2])
-            if i in tmp_objs:
-                tmp_objs.remove(i)
-            s = (heuristic_multi(i, tmp_objs, mst_dict, cost_table) + state[3] + 1, i, tuple(tmp_objs), state[3] + 1)
-            if (s[1], s[2]) not in visited:
-                heapq.heappush(state_queue, s)
-                astarpath[s] = state
-    path = []
-    while state != init_state:
-        path.append(state[1])
-        state = astarpath[state]
-    path.append(start)
-    path.reverse()
+        if events:
+            yield cell, len(open_list), open_list.last_f
+        for n in maze.getCellNeighbors(cell):
+            n_mask = mask & ~obj_bits.get(n, 0)
+            s = n_mask * ncells + n
+            if open_list.improves(s, g + 1):
+                h = heuristic_multi(divmod(n, cols), n_mask, objs, mst_cache, cost_table)
+                open_list.push(s, g + 1, h, i)
+    if mst_cache.misses:
+        save_tables(maze, cost_table, mst_cache)
+
+    return state_path(open_list.trace(i), ncells, cols)
+
+# One solution of anytime_multi_iter: the path, its length, the weight of the pass
+# that found it (None for the initial fast path) and an upper bound on
+# cost / optimal cost
+Improvement = namedtuple("Improvement", ["path", "cost", "weight", "bound"])
+
+def anytime_multi_iter(maze, weights=ANYTIME_WEIGHTS, deadline=None, cancel=None):
+    """
+    Runs restarting weighted A star over the astar_multi state space and heuristic.
+    The fast path is reported first. Each pass then searches with f = g + w * h for
+    the next weight w, pruning every state whose unweighted g + h cannot beat the
+    best path so far, so a pass either finds a shorter path (at most w times the
+    optimum) or proves the best one optimal.
+
+    @param maze: The maze to execute the search on.
+    @param weights: decreasing heuristic weights, ending with 1.0 for an optimal answer
+    @param deadline: stop once time.monotonic() reaches this value, None for no limit
+    @param cancel: an object with is_set(), e.g. a threading.Event, that stops the
+        search when set
+
+    @return improvements: a generator of Improvement, each shorter or with a tighter
+        bound than the one before; a bound of 1.0 means the path is optimal
+    """
+    for event in anytime_passes(maze, weights, deadline, cancel):
+        yield event
+
+def anytime_passes(maze, weights, deadline=None, cancel=None, events=False):
+    # The passes of anytime_multi_iter, yielding each Improvement as it is found and,
+    # with events, (cell, frontier size, None) for every state they expand; the deadline
+    # and cancel are checked every 256 expansions
+    global mst_cache, open_list, visited_size
+    rows, cols = maze.getDimensions()
+    ncells = rows * cols
+    objs, obj_bits = index_objectives(maze)
+    start = maze.getStart()
+    if not objs:
+        yield Improvement([start], 0, None, 1.0)
+        return
+    best = fast(maze)
+    best_cost = len(best) - 1
+    cost_table, mst_cache = multi_tables(maze)
+    full_mask = (1 << len(objs)) - 1
+    root = full_mask * ncells + start[0] * cols + start[1]
+    lower = heuristic_multi(start, full_mask, objs, mst_cache, cost_table)
+    bound = best_cost / lower if lower else 1.0
+    yield Improvement(best, best_cost, None, bound)
+
+    expanded = 0
+    stored = 0
+    open_list = None
+    visited_size = lambda: max(stored, len(open_list.states) if open_list is not None else 0)
+    for w in weights:
+        if bound <= 1.0:
+            break
+        if open_list is not None:
+            stored = max(stored, len(open_list.states))
+        open_list = OpenList()
+        open_list.push(root, 0, w * lower)
+        found = None
+        while open_list:
+            i, state, g = open_list.pop()
+            mask, cell = divmod(state, ncells)
+            if mask == 0:
+                found = i
+                break
+            if events:
+                yield cell, len(open_list), None
+            expanded += 1
+            if expanded & 255 == 0 and ((deadline is not None and time.monotonic() >= deadline) or
+                                        (cancel is not None and cancel.is_set())):
+                return
+            for n in maze.getCellNeighbors(cell):
+                n_mask = mask & ~obj_bits.get(n, 0)
+                s = n_mask * ncells + n
+                if open_list.improves(s, g + 1):
+                    h = heuristic_multi(divmod(n, cols), n_mask, objs, mst_cache, cost_table)
+                    if g + 1 + h < best_cost:
+                        open_list.push(s, g + 1, w * h, i)
+        if found is None:
+            # the pruned space is exhausted: nothing shorter than best exists
+            bound = 1.0
+        else:
+            best = state_path(open_list.trace(found), ncells, cols)
+            best_cost = len(best) - 1
+            bound = min(w, best_cost / lower)
+        yield Improvement(best, best_cost, w, bound)
+    if mst_cache.misses:
+        save_tables(maze, cost_table, mst_cache)
+
+def anytime_multi(maze):
+    """
+    Runs the passes of anytime_multi_iter for at most ANYTIME_TIME_LIMIT seconds.
+
+    @param maze: The maze to execute the search on.
+
+    @return path: a list of tuples containing the coordinates of each state in the best path found
+    """
+    return run_steps(anytime_multi_steps(maze, events=False))
+
+def anytime_multi_steps(maze, events=True):
+    """
+    Step generator of anytime_multi: yields (cell, frontier size, None) for every
+    expanded state and returns the best path found within ANYTIME_TIME_LIMIT seconds.
+    """
+    deadline = time.monotonic() + ANYTIME_TIME_LIMIT
+    for event in anytime_passes(maze, ANYTIME_WEIGHTS, deadline, None, events):
+        if isinstance(event, Improvement):
+            best = event.path
+            continue
+        yield event
+    return best
+
+def tour_path(maze, table, tour):
+    """
+    Expands a tour over the nodes of a DistanceTable into a path through the maze,
+    skipping objectives already passed over on the way.
 
+    @return path: a list of tuples containing the coordinates of each state in the path
+    """
+    node_at = {pos: k for k, pos in enumerate(table.nodes) if k > 0}
+    path = [maze.getStart()]
+    covered = set()
+    cur = 0
+    for node in tour[1:]:
+        if node in covered:
+            continue
+        for pos in table.path(cur, node)[1:]:
+            path.append(pos)
+            if pos in node_at:
+                covered.add(node_at[pos])
+        cur = node
     return path
 
 def fast(maze):
     """
     Runs suboptimal search algorithm for part 4.
 
+    The objectives are ordered as an open TSP tour over the true maze distances of
+    actual_cost_table: a nearest-neighbor tour, improved with 2-opt and Or-opt until
+    neither shortens it, or for at most FAST_MAX_MOVES moves. The legs are then read
+    back from the table's shortest paths, skipping objectives already passed over on
+    the way.
+
     @param maze: The maze to execute the search on.
 
     @return path: a list of tuples containing the coordinates of each state in the computed path
     """
     # TODO: Write your code here
-    objs = maze.getObjectives()
-    objs_r = objs.copy()
+    return run_steps(fast_steps(maze, events=False))
+
+def fast_steps(maze, events=True):
+    """
+    Step generator of fast: yields (start cell, 0, None) once the distance table is
+    built and returns the path.
+    """
+    table = actual_cost_table(maze)
     start = maze.getStart()
-    cur = start
-    path = [cur]
-    while objs:
-        neighbors = maze.getNeighbors(cur[0], cur[1])
-        intersect = [i for i in neighbors if i in objs]
-        if intersect:
-            cur = intersect[0]
-            path.append(cur)
-            objs.remove(cur)
-        else:
-            closest_dot = min(objs, key=lambda x: manhattan_distance(cur, x))
-            maze.setObjectives([closest_dot])
-            maze.setStart(cur)
-            sub_path = astar(maze)
-            path += sub_path[1:]
-            cur = sub_path[-1]
-            objs.remove(cur)
-    maze.setStart(start)
-    maze.setObjectives(objs_r)
-    print(maze.isValidPath(path))
-    return path
\ No newline at end of file
+    if events:
+        yield start[0] * maze.getDimensions()[1] + start[1], 0, None
+    tour = improve_tour(nearest_neighbor_tour(table.matrix), table.matrix, FAST_MAX_MOVES)
+    return tour_path(maze, table, tour)
+
+def held_karp(maze):
+    """
+    Solves the multiple objective case exactly as an open TSP over the true maze
+    distances of actual_cost_table, with the Held-Karp dynamic program. Mazes with
+    more than HELD_KARP_MAX_OBJECTIVES objectives raise ValueError rather than run for
+    hours; anytime_multi handles them, exact if it finishes within ANYTIME_TIME_LIMIT
+    seconds.
+
+    @param maze: The maze to execute the search on.
+
+    @return path: a list of tuples containing the coordinates of each state in the computed path
+    """
+    return run_steps(held_karp_steps(maze, events=False))
+
+def held_karp_steps(maze, events=True):
+    """
+    Step generator of held_karp: yields (start cell, 0, None) once the distance table
+    is built and returns the path.
+    """
+    count = len(maze.getObjectives())
+    if count > HELD_KARP_MAX_OBJECTIVES:
+        raise ValueError("held_karp solves at most %d objectives exactly, this maze has %d; "
+                         "use anytime_multi" % (HELD_KARP_MAX_OBJECTIVES, count))
+    table = actual_cost_table(maze)
+    start = maze.getStart()
+    if events:
+        yield start[0] * maze.getDimensions()[1] + start[1], 0, None
+    return tour_path(maze, table, held_karp_tour(table.matrix))
+
+# The methods search() dispatches to, by --method name
+SEARCH_METHODS = {
+    "bfs": bfs,
+    "astar": astar,
+    "bibfs": bibfs,
+    "jps": jps,
+    "corridor": corridor,
+    "wavefront": wavefront_bfs,
+    "astar_corner": astar_corner,
+    "astar_multi": astar_multi,
+    "fast": fast,
+    "anytime_multi": anytime_multi,
+    "held_karp": held_karp,
+}
+
+# The step generators search_iter drives, by --method name. Each takes an events
+# flag: with events=False it yields nothing per expanded state, which is how the
+# plain search functions run it
+SEARCH_STEPS = {
+    "bfs": bfs_steps,
+    "astar": astar_steps,
+    "bibfs": bibfs_steps,
+    "jps": jps_steps,
+    "corridor": corridor_steps,
+    "wavefront": wavefront_steps,
+    "astar_corner": astar_corner_steps,
+    "astar_multi": astar_multi_steps,
+    "fast": fast_steps,
+    "anytime_multi": anytime_multi_steps,
+    "held_karp": held_karp_steps,
+}
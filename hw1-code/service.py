@@ -0,0 +1,358 @@
+# service.py
+# ---------------
+"""
+This file contains the resident solver service. It listens on a local Unix
+socket, or on a TCP port of 127.0.0.1 where there are no Unix sockets, and
+answers solve requests concurrently. The searches run on a pool of worker
+processes, one maze at a time each. Each worker keeps its parsed mazes, and
+search.py its distance tables, in memory. Finished results are kept too, so a
+repeated query is answered without reaching a worker at all. As in batch.py, a
+solve that runs past the timeout has its worker killed and replaced, and so
+does a worker that dies; the request gets a "timeout" or "error" answer, and
+every request gets an answer.
+
+The protocol is one JSON object per line in each direction. A request
+{"maze": "maps/single/bigMaze.txt", "method": "astar", "id": 1} is answered with
+the fields of batch.solve_one plus "id" and "cached". The maze path is resolved
+by the service, and a file that changes on disk is solved again. Include
+"path": false to leave the path out of the answer. A request {"op": "stats"} is
+answered with the cache and worker counters.
+
+Run this file to start the service, or with --solve to send it one request:
+
+    python service.py --workers 4 --timeout 30
+    python service.py --solve maps/single/bigMaze.txt --method astar
+"""
+
+import io
+import os
+import json
+import stat
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import distance
+from maze import Maze
+from cache import LRUCache
+from search import search, SEARCH_METHODS
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "hw1-solver.sock")
+DEFAULT_PORT = 8765
+
+# Parsed mazes kept by each worker process
+MAZE_CACHE_SIZE = 32
+
+# Finished results kept by the service
+RESULT_CACHE_SIZE = 1024
+
+# Workers are not forked from the service itself, which would hand them copies of
+# the client connections open at the time and keep those open after the service
+# closes them; the fork server starts them from a clean process with search.py
+# already imported
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _context = multiprocessing.get_context("forkserver")
+    _context.set_forkserver_preload(["search"])
+else:
+    _context = multiprocessing.get_context("spawn")
+
+# The parsed mazes of this worker process, by (path, mtime, size)
+_mazes = None
+
+def _init_worker():
+    global _mazes
+    _mazes = LRUCache(MAZE_CACHE_SIZE)
+    # the service pool already keeps every core busy
+    distance.WORKERS = 1
+
+def _solve(stamp, method):
+    # Solves one maze in a worker process; stamp is (path, mtime, size)
+    filename = stamp[0]
+    try:
+        # Maze prints its error on stdout before raising SystemExit for a bad file
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            maze = _mazes.get(stamp)
+            if maze is None:
+                maze = Maze(filename)
+                _mazes.put(stamp, maze)
+            explored = maze.getStatesExplored()
+            t = time.perf_counter()
+            path = search(maze, method)
+            search_time = time.perf_counter() - t
+    except SystemExit:
+        return {"file": filename, "method": method, "status": "error", "error": out.getvalue().strip()}
+    except Exception as e:
+        return {"file": filename, "method": method, "status": "error",
+                "error": "%s: %s" % (type(e).__name__, e)}
+    return {
+        "file": filename,
+        "method": method,
+        "status": "ok",
+        "path": path,
+        "path_length": len(path),
+        "states_explored": maze.getStatesExplored() - explored,
+        "verdict": maze.isValidPath(path),
+        "search_time": search_time,
+    }
+
+def _worker(conn):
+    # The loop of one worker process: solves (stamp, method) tasks until it gets None
+    _init_worker()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            # the service is gone
+            break
+        if task is None:
+            break
+        conn.send(_solve(*task))
+    conn.close()
+
+class _Worker:
+    # One worker process and the pipe to it, as batch._Slot
+    def __init__(self):
+        self.conn, child = _context.Pipe()
+        self.process = _context.Process(target=_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    # Runs one solve on the worker and returns its result; blocks, so the service
+    # calls it from a thread. Raises EOFError or OSError if the worker dies.
+    def call(self, stamp, method):
+        self.conn.send((stamp, method))
+        return self.conn.recv()
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+def _unlink_socket(path):
+    # Removes the Unix socket at path, if there is one, and refuses to remove anything
+    # else, since --socket may name any file
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("%s exists and is not a socket" % path)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+class SolverService:
+    # Answers requests from the result cache or a worker, and solves a maze only once
+    # when identical requests arrive while it is being solved. timeout is the most
+    # seconds a solve may run on a worker, None for no limit.
+    def __init__(self, workers=None, timeout=None):
+        size = workers or os.cpu_count() or 1
+        self.workers = [_Worker() for _ in range(size)]
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        # one thread per worker waits for its answer
+        self.threads = ThreadPoolExecutor(size)
+        self.timeout = timeout
+        self.results = LRUCache(RESULT_CACHE_SIZE)
+        self.pending = {}
+        self.requests = 0
+        self.timeouts = 0
+        self.replaced = 0
+        self.closed = False
+
+    async def solve(self, filename, method):
+        """
+        @param filename: path to a maze file, as seen by the service
+        @param method: a key of search.SEARCH_METHODS
+
+        @return result: a solve result as in batch.solve_one, with "cached" set if it
+            came from the result cache
+        """
+        if method not in SEARCH_METHODS:
+            return {"file": filename, "method": method, "status": "error", "error": "unknown method"}
+        try:
+            st = os.stat(filename)
+        except OSError as e:
+            return {"file": filename, "method": method, "status": "error", "error": str(e)}
+        stamp = (os.path.realpath(filename), st.st_mtime_ns, st.st_size)
+        key = stamp + (method,)
+
+        result = self.results.get(key)
+        if result is not None:
+            return dict(result, file=filename, cached=True)
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(stamp, method))
+            self.pending[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        # a client that goes away must not cancel the solve for the others
+        result = await asyncio.shield(future)
+        return dict(result, file=filename, cached=False)
+
+    async def _run(self, stamp, method):
+        # Solves on the next idle worker, replacing the worker if it runs out of time
+        # or dies
+        worker = await self.idle.get()
+        try:
+            call = asyncio.get_running_loop().run_in_executor(self.threads, worker.call, stamp, method)
+            return await asyncio.wait_for(call, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            worker = self._replace(worker)
+            return {"file": stamp[0], "method": method, "status": "timeout"}
+        except (EOFError, OSError):
+            # the worker died, e.g. killed or out of memory, or the service stopped it
+            dead, worker = worker, self._replace(worker)
+            return {"file": stamp[0], "method": method, "status": "error",
+                    "error": "worker exited with code %s" % dead.process.exitcode}
+        finally:
+            self.idle.put_nowait(worker)
+
+    def _replace(self, worker):
+        # Kills worker and starts a new one in its place, unless the service is
+        # stopping; the thread waiting on the old worker's pipe sees it close and returns
+        worker.stop(kill=True)
+        if self.closed:
+            return worker
+        self.workers.remove(worker)
+        self.workers.append(_Worker())
+        self.replaced += 1
+        return self.workers[-1]
+
+    def _finish(self, key, future):
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None and future.result()["status"] == "ok":
+            self.results.put(key, future.result())
+
+    def stats(self):
+        return {"requests": self.requests, "in_flight": len(self.pending), "timeouts": self.timeouts,
+                "workers_replaced": self.replaced, "results": self.results.stats()}
+
+    async def respond(self, line, writer):
+        try:
+            request = json.loads(line)
+            if request.get("op", "solve") == "stats":
+                answer = self.stats()
+            else:
+                self.requests += 1
+                answer = await self.solve(request["maze"], request.get("method", "bfs"))
+                if not request.get("path", True):
+                    answer.pop("path", None)
+            if "id" in request:
+                answer["id"] = request["id"]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            answer = {"status": "error", "error": "bad request: %s" % e}
+        except Exception as e:
+            # whatever goes wrong, the client gets an answer rather than waiting forever
+            answer = {"status": "error", "error": "%s: %s" % (type(e).__name__, e)}
+        writer.write(json.dumps(answer).encode() + b"\n")
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        # requests on one connection are answered as they finish, not in order
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, port=None):
+        """
+        Serves until cancelled or terminated, on the Unix socket socket_path if port is
+        None and on 127.0.0.1:port otherwise. Raises FileExistsError if socket_path
+        names something other than a socket.
+        """
+        # SIGTERM cancels the server so that the socket file is removed
+        with contextlib.suppress(NotImplementedError, AttributeError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if port is None:
+            _unlink_socket(socket_path)
+            server = await asyncio.start_unix_server(self.handle, socket_path)
+        else:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # a solve in progress is not waited for: its worker is terminated, which
+            # also ends the thread waiting on it
+            self.closed = True
+            self.threads.shutdown(wait=False, cancel_futures=True)
+            for worker in self.workers:
+                worker.stop(kill=True)
+            if port is None:
+                with contextlib.suppress(FileExistsError):
+                    _unlink_socket(socket_path)
+
+def request(payload, socket_path=None, port=None):
+    """
+    Sends one request to a running service and waits for its answer.
+
+    @param payload: the request object
+    @param socket_path, port: the address, as for SolverService.serve
+
+    @return answer: the decoded answer
+    """
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection(("127.0.0.1", port))
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(payload).encode() + b"\n")
+        f.flush()
+        return json.loads(f.readline())
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='HW1 Solver Service')
+
+    parser.add_argument('--socket', dest="socket", type=str, default = DEFAULT_SOCKET,
+                        help='Unix socket to listen on or connect to - default %s' % DEFAULT_SOCKET)
+    parser.add_argument('--port', dest="port", type=int, default = None,
+                        help='use this TCP port of 127.0.0.1 instead of the socket - default off, '
+                             'or %d where there are no Unix sockets' % DEFAULT_PORT)
+    parser.add_argument('--workers', dest="workers", type=int, default = None,
+                        help='worker processes - default one per core')
+    parser.add_argument('--timeout', dest="timeout", type=float, default = None,
+                        help='seconds allowed per solve before its worker is replaced - default no limit')
+    parser.add_argument('--solve', dest="solve", type=str, default = None,
+                        help='send one request for this maze file to a running service and print the answer')
+    parser.add_argument('--method', dest="search", type=str, default = "bfs",
+                        choices = list(SEARCH_METHODS),
+                        help='search method of --solve - default bfs')
+
+    args = parser.parse_args()
+    port = args.port
+    if port is None and not hasattr(socket, "AF_UNIX"):
+        port = DEFAULT_PORT
+    if args.solve is not None:
+        # the service resolves the path from its own working directory
+        print(json.dumps(request({"maze": os.path.abspath(args.solve), "method": args.search},
+                                 args.socket, port), indent=2))
+    else:
+        try:
+            with contextlib.suppress(KeyboardInterrupt, asyncio.CancelledError):
+                asyncio.run(SolverService(args.workers, args.timeout).serve(args.socket, port))
+        except FileExistsError as e:
+            parser.error(str(e))
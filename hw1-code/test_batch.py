@@ -0,0 +1,102 @@
+# test_batch.py
+# ---------------
+"""
+This file contains the tests of the batch solver in batch.py: every maze must
+come back exactly once with the result search() gives for it, a maze that
+cannot be loaded with status "error" and a maze that runs past the timeout
+with status "timeout", without holding up or failing the others, and the
+workers must save the images they are asked for. Run with:
+
+    python -m pytest test_batch.py
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import batch
+import cache
+import render
+from maze import Maze
+from search import search
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+QUICK = [os.path.join(MAPS, "single", name) for name in ("tinyMaze.txt", "smallMaze.txt", "mediumMaze.txt")]
+# bfs takes seconds on this maze
+SLOW = os.path.join(MAPS, "multi", "mediumSearch.txt")
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.enabled = cache.ENABLED
+        cache.ENABLED = False
+
+    def tearDown(self):
+        cache.ENABLED = self.enabled
+        shutil.rmtree(self.directory)
+
+    def solve(self, files, method="bfs", **options):
+        # Runs a batch and returns its results by file, checking each file came back once
+        results = list(batch.solve_batch(files, method, **options))
+        self.assertEqual(sorted(r["file"] for r in results), sorted(files))
+        return {r["file"]: r for r in results}
+
+    def test_results_match_search(self):
+        results = self.solve(QUICK, "astar", workers=2)
+        for filename in QUICK:
+            result = results[filename]
+            self.assertEqual((result["status"], result["method"], result["verdict"]), ("ok", "astar", "Valid"))
+            self.assertEqual(result["path"], search(Maze(filename), "astar"), filename)
+            self.assertEqual(result["path_length"], len(result["path"]))
+        self.assertEqual(list(batch.solve_batch([], "bfs")), [])
+
+    def test_errors_do_not_stop_the_batch(self):
+        missing = os.path.join(self.directory, "missing.txt")
+        ragged = os.path.join(self.directory, "ragged.txt")
+        with open(ragged, 'w') as f:
+            f.write("%%%%\n%P.\n%%%%\n")
+        results = self.solve([missing, ragged] + QUICK, workers=1)
+        self.assertEqual(results[missing]["status"], "error")
+        self.assertIn("FileNotFoundError", results[missing]["error"])
+        self.assertEqual(results[ragged]["error"], "Maze dimensions incorrect")
+        self.assertTrue(all(results[f]["status"] == "ok" for f in QUICK))
+
+    def test_timeout(self):
+        t = time.monotonic()
+        results = self.solve([SLOW] + QUICK, workers=2, timeout=0.5)
+        self.assertLess(time.monotonic() - t, 3.0)
+        self.assertEqual(results[SLOW], {"file": SLOW, "method": "bfs", "status": "timeout"})
+        self.assertTrue(all(results[f]["status"] == "ok" for f in QUICK))
+
+    @unittest.skipUnless(render.available, "needs NumPy")
+    def test_images(self):
+        results = self.solve(QUICK[:2], images=self.directory, scale=4)
+        for filename in QUICK[:2]:
+            image = results[filename]["image"]
+            self.assertEqual(os.path.dirname(image), self.directory)
+            with open(image, 'rb') as f:
+                self.assertEqual(f.read(len(render.PNG_SIGNATURE)), render.PNG_SIGNATURE)
+            self.assertGreaterEqual(results[filename]["render_time"], 0)
+
+    def test_expand_inputs(self):
+        single = os.path.join(MAPS, "single")
+        files = batch.expand_inputs([os.path.join(single, "tiny*.txt"), QUICK[0], os.path.join(single, "nothing*")])
+        self.assertEqual(files, [QUICK[0]])
+        self.assertEqual(batch.expand_inputs([single, os.path.join(single, "*.txt")]), batch.expand_inputs([single]))
+
+    def test_summarize(self):
+        results = [
+            {"status": "ok", "verdict": "Valid", "search_time": 0.5},
+            {"status": "ok", "verdict": "Invalid", "search_time": 0.25},
+            {"status": "error"},
+            {"status": "timeout"},
+        ]
+        summary = batch.summarize(results, 2.0)
+        self.assertEqual(summary, {"mazes": 4, "ok": 2, "valid": 1, "error": 1, "timeout": 1,
+                                   "search_time": 0.75, "wall_time": 2.0, "mazes_per_second": 2.0})
+        self.assertIsNone(batch.summarize([], 0.0)["mazes_per_second"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# test_cache.py
+# ---------------
+"""
+This file contains the tests of the disk cache and the LRU memo in cache.py:
+tables must read back as they were saved, under a key that is the same for the
+text and binary files of a maze and changes when the maze does, and a damaged
+or foreign cache file must count as a miss, never as an error or a wrong
+answer. Run with:
+
+    python -m pytest test_cache.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import cache
+import mazefile
+from maze import Maze
+from search import search
+
+TEXT = "%%%%%%%\n%P  . %\n% %%% %\n%.   .%\n%%%%%%%\n"
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = cache.CACHE_DIR, cache.ENABLED
+        cache.CACHE_DIR = os.path.join(self.directory, "cache")
+        cache.ENABLED = True
+        self.text = self.write("maze.txt", TEXT)
+        self.maze = Maze(self.text)
+        self.matrix = [[0, 3, 2, 6], [3, 0, 5, 3], [2, 5, 0, 4], [6, 3, 4, 0]]
+        self.mst = {0b1: 0, 0b11: 5, 0b111: 7, 1 << 40: 9}
+
+    def tearDown(self):
+        cache.CACHE_DIR, cache.ENABLED = self.saved
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as f:
+            f.write(text)
+        return filename
+
+    def entry(self):
+        return cache.cache_path(cache.maze_digest(self.maze))
+
+    def test_round_trip(self):
+        self.assertEqual(cache.load_tables(self.maze), (None, {}))
+        cache.save_tables(self.maze, self.matrix, self.mst)
+        self.assertEqual(cache.load_tables(self.maze), (self.matrix, self.mst))
+        lru = cache.LRUCache(2, [(1, 4), (2, 8)])
+        cache.save_tables(self.maze, self.matrix, lru)
+        self.assertEqual(cache.load_tables(self.maze), (self.matrix, {1: 4, 2: 8}))
+        self.assertEqual(os.listdir(cache.CACHE_DIR), [os.path.basename(self.entry())])
+
+    def test_digest(self):
+        binary = os.path.join(self.directory, "maze" + mazefile.BINARY_EXTENSION)
+        mazefile.write_binary(self.maze, binary)
+        self.assertEqual(cache.maze_digest(Maze(binary)), cache.maze_digest(self.maze))
+        for edited in (TEXT.replace(" .", ". "), TEXT.replace("P ", " P"), TEXT.replace("% %%%", "%  %%")):
+            other = Maze(self.write("edited.txt", edited))
+            self.assertNotEqual(cache.maze_digest(other), cache.maze_digest(self.maze), edited)
+
+    def test_damaged_files_are_misses(self):
+        cache.save_tables(self.maze, self.matrix, self.mst)
+        with open(self.entry(), 'rb') as f:
+            data = f.read()
+        size = cache.HEADER.size
+        cases = {
+            "empty": b"",
+            "header": data[:size - 1],
+            "magic": b"XXXX" + data[4:],
+            "version": data[:4] + b"\x02\x00" + data[6:],
+            "nodes": data[:6] + b"\x05" + data[7:],
+            "digest": data[:size] + bytes(32) + data[size + 32:],
+            "matrix": data[:size + 32 + 10],
+            "mst": data[:-1],
+            "garbage": os.urandom(len(data)),
+        }
+        for name, content in cases.items():
+            with open(self.entry(), 'wb') as f:
+                f.write(content)
+            self.assertEqual(cache.load_tables(self.maze), (None, {}), name)
+
+    def test_damaged_file_does_not_change_paths(self):
+        maze = Maze(self.text)
+        expected = search(maze, "astar_multi")
+        self.assertTrue(os.path.exists(self.entry()))
+        with open(self.entry(), 'r+b') as f:
+            f.seek(cache.HEADER.size + 32)
+            f.write(b"\xff" * 16)
+        self.assertEqual(search(Maze(self.text), "astar_multi"), expected)
+        os.truncate(self.entry(), cache.HEADER.size + 40)
+        self.assertEqual(search(Maze(self.text), "astar_multi"), expected)
+
+    def test_disabled_and_unwritable(self):
+        cache.ENABLED = False
+        cache.save_tables(self.maze, self.matrix, self.mst)
+        self.assertFalse(os.path.exists(cache.CACHE_DIR))
+        cache.ENABLED = True
+        cache.CACHE_DIR = self.text
+        cache.save_tables(self.maze, self.matrix, self.mst)
+        self.assertEqual(cache.load_tables(self.maze), (None, {}))
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = cache.LRUCache(2)
+        lru.put(1, 10)
+        lru.put(2, 20)
+        self.assertEqual(lru.get(1), 10)
+        lru.put(3, 30)
+        self.assertIsNone(lru.get(2))
+        self.assertEqual(dict(lru.items()), {1: 10, 3: 30})
+        self.assertEqual(lru.stats(), {"hits": 1, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2})
+        lru.clear()
+        self.assertEqual((len(lru), lru.hits, lru.misses), (0, 1, 1))
+
+    def test_seeded_items_keep_the_bound(self):
+        lru = cache.LRUCache(2, [(1, 10), (2, 20), (3, 30)])
+        self.assertEqual(list(lru.items()), [(2, 20), (3, 30)])
+        self.assertEqual(lru.evictions, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# test_instrument.py
+# ---------------
+"""
+This file contains the tests of the profiler in instrument.py: every method must
+report the counters and phases it can measure, the hooks must be taken out of
+search.py and frontier.py again after a run, even a failed one, and the
+profile must export as JSON. Run with:
+
+    python -m pytest test_instrument.py
+"""
+
+import os
+import json
+import unittest
+
+import cache
+import instrument
+import search as search_module
+from frontier import StateStore
+from maze import Maze
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+SINGLE = os.path.join(MAPS, "single", "mediumMaze.txt")
+MULTI = os.path.join(MAPS, "multi", "tinySearch.txt")
+
+# Methods that keep an OpenList, and so report heap counters
+OPEN_LIST_METHODS = ("astar", "jps", "corridor", "astar_corner", "astar_multi", "anytime_multi")
+
+class InstrumentTest(unittest.TestCase):
+    def setUp(self):
+        self.enabled = cache.ENABLED
+        cache.ENABLED = False
+
+    def tearDown(self):
+        cache.ENABLED = self.enabled
+
+    def test_counters_and_phases(self):
+        for method in search_module.SEARCH_METHODS:
+            filename = MULTI if method in ("astar_multi", "fast", "anytime_multi", "held_karp") else SINGLE
+            profile = instrument.profile_run(filename, method)
+            counters, phases = profile.counters, profile.phases
+            self.assertEqual(profile.captures["run"]["verdict"], "Valid", method)
+            self.assertGreater(counters["expansions"], 0, method)
+            self.assertGreater(phases["reconstruct"], 0, method)
+            self.assertLessEqual(phases["reconstruct"], phases["search"], method)
+            if method in ("fast", "held_karp"):
+                self.assertNotIn("peak_closed", counters, method)
+                self.assertGreater(phases["preprocess"], 0, method)
+            else:
+                self.assertGreaterEqual(counters["peak_closed"], counters["expansions"], method)
+            if method in OPEN_LIST_METHODS:
+                self.assertGreaterEqual(counters["heap_pops"], counters["expansions"], method)
+                self.assertGreaterEqual(counters["heap_pushes"], counters["heap_pops"], method)
+            else:
+                self.assertNotIn("heap_pushes", counters, method)
+
+    def test_heuristic_calls_counts_outermost(self):
+        # astar computes one heuristic per push, and heuristic_corner recurses
+        counters = instrument.profile_run(SINGLE, "astar").counters
+        self.assertEqual(counters["heuristic_calls"], counters["heap_pushes"])
+        counters = instrument.profile_run(os.path.join(MAPS, "corner", "tinyCorners.txt"), "astar_corner").counters
+        self.assertEqual(counters["heuristic_calls"], counters["heap_pushes"])
+
+    def test_hooks_are_removed(self):
+        functions = {fn: getattr(search_module, fn)
+                     for fns in instrument.PHASE_FUNCTIONS.values() for fn in fns}
+        trace = StateStore.__dict__["trace"]
+        instrument.profile_run(SINGLE, "jps")
+        maze = Maze(os.path.join(MAPS, "multi", "bigSearch.txt"))
+        with self.assertRaises(ValueError):
+            instrument.instrumented_search(maze, "held_karp", instrument.Profile())
+        for fn, original in functions.items():
+            self.assertIs(getattr(search_module, fn), original, fn)
+        self.assertIs(StateStore.__dict__["trace"], trace)
+
+    def test_runs_accumulate_and_export(self):
+        profile = instrument.Profile(cprofile=True, memory=True)
+        for _ in range(2):
+            instrument.instrumented_search(Maze(SINGLE), "bfs", profile)
+        once = instrument.profile_run(SINGLE, "bfs").counters
+        self.assertEqual(profile.counters["expansions"], 2 * once["expansions"])
+        self.assertEqual(profile.counters["peak_closed"], once["peak_closed"])
+        report = json.loads(profile.to_json())
+        self.assertEqual(set(report), {"counters", "phases", "cprofile", "tracemalloc"})
+        self.assertLessEqual(len(report["cprofile"]), instrument.CPROFILE_TOP)
+        self.assertGreater(report["tracemalloc"]["peak_bytes"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
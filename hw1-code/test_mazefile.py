@@ -0,0 +1,93 @@
+# test_mazefile.py
+# ---------------
+"""
+This file contains the tests of the maze file readers and the binary maze
+format: a binary maze must read back exactly as the text maze it was written
+from, damaged files must be refused with ValueError, and the batch and bench
+tools must find binary mazes as well as text ones. Run with:
+
+    python -m pytest test_mazefile.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bench
+import batch
+import mazefile
+from maze import Maze
+from search import search
+
+TEXT = "%%%%%%%\n%P  . %\n% %%% %\n%.   .%\n%%%%%%%\n"
+
+class MazeFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.text = os.path.join(self.directory, "maze.txt")
+        with open(self.text, 'w') as f:
+            f.write(TEXT)
+        self.binary = os.path.join(self.directory, "maze" + mazefile.BINARY_EXTENSION)
+        mazefile.write_binary(Maze(self.text), self.binary)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_text(self):
+        rows, cols, walls, start, objectives, lines = mazefile.read_text(self.text)
+        self.assertEqual((rows, cols, start), (5, 7, (1, 1)))
+        self.assertEqual(objectives, [(1, 4), (3, 1), (3, 5)])
+        self.assertEqual(bytes(walls), bytes(1 if ch == '%' else 0 for ch in TEXT.replace("\n", "")))
+        self.assertEqual(lines, TEXT.encode().splitlines())
+
+    def test_text_line_endings_and_blank_lines(self):
+        with open(self.text, 'wb') as f:
+            f.write(b"\r\n" + TEXT.replace("\n", "\r\n").encode() + b"   \n")
+        self.assertEqual(mazefile.read_text(self.text)[:5], mazefile.read_binary(self.binary)[:5])
+
+    def test_binary_matches_text(self):
+        text, binary = mazefile.read_text(self.text), mazefile.read_binary(self.binary)
+        self.assertEqual(text[:2], binary[:2])
+        self.assertEqual(bytes(text[2]), bytes(binary[2]))
+        self.assertEqual(text[3:5], binary[3:5])
+        self.assertIsNone(binary[5])
+        self.assertEqual(Maze(self.binary).mazeRaw, Maze(self.text).mazeRaw)
+        for method in ("bfs", "astar_multi"):
+            self.assertEqual(search(Maze(self.binary), method), search(Maze(self.text), method))
+
+    def test_read_maze_tells_formats_apart(self):
+        self.assertIsNotNone(mazefile.read_maze(self.text)[5])
+        self.assertIsNone(mazefile.read_maze(self.binary)[5])
+
+    def test_bad_files(self):
+        with open(self.binary, 'rb') as f:
+            data = f.read()
+        cases = {
+            "empty.txt": b"\n  \n",
+            "ragged.txt": b"%%%%\n%P.\n%%%%\n",
+            "header.mazb": data[:mazefile.HEADER.size - 1],
+            "walls.mazb": data[:-1],
+            "version.mazb": data[:4] + b"\x02\x00" + data[6:],
+        }
+        for name, content in cases.items():
+            filename = os.path.join(self.directory, name)
+            with open(filename, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ValueError, msg=name):
+                mazefile.read_maze(filename)
+
+    def test_tools_find_binary_mazes(self):
+        nested = os.path.join(self.directory, "multi", "deeper")
+        os.makedirs(nested)
+        shutil.copy(self.binary, nested)
+        shutil.copy(self.text, os.path.join(self.directory, "multi"))
+        self.assertEqual(batch.expand_inputs([self.directory]),
+                         sorted([self.text, self.binary, os.path.join(nested, os.path.basename(self.binary)),
+                                 os.path.join(self.directory, "multi", "maze.txt")]))
+        self.assertEqual(bench.find_maps(self.directory, ("multi",)), [os.path.join(self.directory, "multi", "maze.txt")])
+        self.assertEqual(bench.find_maps(self.directory, (".",)), [os.path.join(self.directory, ".", "maze.mazb"),
+                                                                   os.path.join(self.directory, ".", "maze.txt")])
+
+if __name__ == "__main__":
+    unittest.main()
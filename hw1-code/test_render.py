@@ -0,0 +1,125 @@
+# test_render.py
+# ---------------
+"""
+This file contains the tests of the array renderer in render.py: the frame must
+show the walls, the path gradient, the start and the objectives where the
+pygame drawing in hw1.py puts them, and write_png must save a PNG that any
+reader accepts and that decodes back to the very same frame. The PNG is
+checked here with zlib and struct only. Run with:
+
+    python -m pytest test_render.py
+"""
+
+import os
+import zlib
+import struct
+import shutil
+import tempfile
+import unittest
+
+import render
+from maze import Maze
+from search import search
+
+if render.available:
+    import numpy as np
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+
+def read_png(filename):
+    """
+    Decodes an 8-bit RGB PNG as written by render.write_png, checking the chunk CRCs.
+
+    @return frame: a (height, width, 3) uint8 array
+    @return filters: the filter type of every row
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    assert data[:8] == render.PNG_SIGNATURE
+    offset, chunks = 8, []
+    while offset < len(data):
+        length, tag = struct.unpack_from(">I4s", data, offset)
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack_from(">I", data, offset + 8 + length)
+        assert crc == zlib.crc32(tag + body), tag
+        chunks.append((tag, body))
+        offset += 12 + length
+    assert [tag for tag, _ in chunks] == [b"IHDR", b"IDAT", b"IEND"]
+    width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert (depth, color, compression, filtering, interlace) == (8, 2, 0, 0, 0)
+    raw = np.frombuffer(zlib.decompress(chunks[1][1]), dtype=np.uint8).reshape(height, 1 + 3 * width)
+    rows = raw[:, 1:].copy()
+    for y in range(height):
+        # 0 is no filter and 2 is "up"; write_png uses no others
+        assert raw[y, 0] in (0, 2)
+        if raw[y, 0] == 2 and y > 0:
+            rows[y] += rows[y - 1]
+    return rows.reshape(height, width, 3), raw[:, 0]
+
+@unittest.skipUnless(render.available, "needs NumPy")
+class RenderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.maze = Maze(os.path.join(MAPS, "multi", "tinySearch.txt"))
+        self.path = search(Maze(os.path.join(MAPS, "multi", "tinySearch.txt")), "astar_multi")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_frame(self):
+        scale = 8
+        frame = render.render_frame(self.maze, self.path, scale)
+        rows, cols = self.maze.getDimensions()
+        self.assertEqual((frame.shape, frame.dtype), ((rows * scale, cols * scale, 3), np.uint8))
+        # the top left pixel of a block is never covered by a marker
+        corners = frame[::scale, ::scale]
+        first, last = render.PATH_COLORS
+        # a cell the path passes more than once shows the color of its last visit
+        visits = {cell: k for k, cell in enumerate(self.path)}
+        for (r, c), k in visits.items():
+            expected = [int(a + k * ((b - a) / len(self.path))) for a, b in zip(first, last)]
+            self.assertTrue(np.abs(corners[r, c].astype(int) - expected).max() <= 1, (k, r, c))
+        for r in range(rows):
+            for c in range(cols):
+                if self.maze.isWall(r, c):
+                    self.assertEqual(tuple(corners[r, c]), render.WALL_COLOR)
+                elif (r, c) not in self.path:
+                    self.assertEqual(tuple(corners[r, c]), render.BACKGROUND)
+        r, c = self.maze.getStart()
+        self.assertEqual(tuple(frame[r * scale + scale // 2, c * scale + scale // 2]), render.START_COLOR)
+        for r, c in self.maze.getObjectives():
+            self.assertEqual(tuple(frame[r * scale + scale // 2, c * scale + scale // 2]), render.OBJECTIVE_COLOR)
+
+    def test_empty_path(self):
+        frame = render.render_frame(self.maze, [], 4)
+        colors = {tuple(pixel) for pixel in frame.reshape(-1, 3)}
+        self.assertEqual(colors, {render.BACKGROUND, render.WALL_COLOR, render.START_COLOR})
+
+    def test_png_decodes_to_frame(self):
+        filename = os.path.join(self.directory, "maze.png")
+        frame = render.render_frame(self.maze, self.path)
+        for level in (0, render.PNG_LEVEL, 9):
+            render.write_png(frame, filename, level)
+            decoded, filters = read_png(filename)
+            self.assertTrue(np.array_equal(decoded, frame), level)
+            # exactly the rows equal to the one above are stored with the "up" filter
+            repeated = [y > 0 and np.array_equal(frame[y], frame[y - 1]) for y in range(len(frame))]
+            self.assertEqual(list(filters == 2), repeated)
+            self.assertGreater(sum(repeated), len(frame) // 2)
+        noise = np.random.RandomState(0).randint(0, 256, size=(7, 5, 3)).astype(np.uint8)
+        render.write_png(noise, filename)
+        self.assertTrue(np.array_equal(read_png(filename)[0], noise))
+
+    def test_save_image(self):
+        filename = os.path.join(self.directory, "maze.png")
+        render.save_image(self.maze, self.path, filename, scale=3)
+        self.assertTrue(np.array_equal(read_png(filename)[0], render.render_frame(self.maze, self.path, 3)))
+
+    def test_can_export(self):
+        self.assertTrue(render.can_export("out/maze.png"))
+        self.assertTrue(render.can_export("MAZE.PNG"))
+        self.assertFalse(render.can_export("maze.jpg"))
+        self.assertFalse(render.can_export("maze.png.txt"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+# test_search.py
+# ---------------
+"""
+This file contains the randomized equivalence checks of the search methods and
+the path validator. Mazes are generated with a fixed seed, so a failure can be
+reproduced. Every method must find a path as short as bfs does, which is
+optimal, and the per-step and NumPy variants of Maze.isValidPath must return
+the same verdict for every path. search_iter must stop at its expansion budget,
+deadline and cancel event, and return the same path as search() otherwise. Run
+with:
+
+    python -m pytest test_search.py
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import cache
+import maze as maze_module
+import wavefront
+from maze import Maze
+import search as search_module
+from search import search, search_iter, SearchResult, SEARCH_STEPS
+from distance import DistanceTable, bfs_field
+
+SEED = 20220303
+
+# Methods that solve the first objective of a maze
+SINGLE_METHODS = ("astar", "bibfs", "jps", "corridor", "wavefront", "astar_corner", "astar_multi")
+
+# Methods that are exact for any number of objectives; anytime_multi is exact when it
+# finishes within its time limit, which these small mazes never reach
+MULTI_METHODS = ("astar_multi", "held_karp", "anytime_multi")
+
+def write_maze(directory, name, rows, cols, walls, objectives, rng):
+    """
+    Writes a random maze with a wall border and returns its file name.
+
+    @param walls: probability of an inner cell being a wall
+    @param objectives: number of '.' cells
+    """
+    grid = [['%' if r in (0, rows - 1) or c in (0, cols - 1) or rng.random() < walls else ' '
+             for c in range(cols)] for r in range(rows)]
+    free = [(r, c) for r in range(rows) for c in range(cols) if grid[r][c] == ' ']
+    cells = rng.sample(free, objectives + 1)
+    grid[cells[0][0]][cells[0][1]] = 'P'
+    for r, c in cells[1:]:
+        grid[r][c] = '.'
+    filename = os.path.join(directory, name)
+    with open(filename, 'w') as f:
+        f.write('\n'.join(''.join(row) for row in grid) + '\n')
+    return filename
+
+def random_walk(maze, rng, steps, noise):
+    # A path from the start that follows open moves, and with probability noise per
+    # step makes a diagonal hop, jump, pause or step into a wall instead
+    path = [maze.getStart()]
+    rows, cols = maze.getDimensions()
+    for _ in range(steps):
+        r, c = path[-1]
+        x = rng.random() * 0.06 / noise if noise else 1.0
+        if x < 0.02:
+            path.append((r + 1, c + 1))
+        elif x < 0.03:
+            path.append((r + 2, c))
+        elif x < 0.04:
+            path.append((r, c))
+        elif x < 0.06:
+            path.append((r + rng.choice((1, -1)), c))
+        else:
+            neighbors = maze.getNeighbors(r, c) if 0 <= r < rows and 0 <= c < cols else ()
+            path.append(rng.choice(neighbors) if neighbors else (r, c))
+    if rng.random() < 0.3:
+        path.append(rng.choice(maze.getObjectives()))
+    return path
+
+def random_tour(maze, table, rng):
+    # A path that visits some or all objectives in a random order along shortest legs,
+    # sometimes stepping aside and back, which revisits a cell, or past the last one
+    order = list(range(1, len(table.nodes)))
+    rng.shuffle(order)
+    if rng.random() < 0.2:
+        order = order[:rng.randint(0, len(order))]
+    path = [maze.getStart()]
+    cur = 0
+    for node in order:
+        path += table.path(node, cur)[::-1][1:]
+        cur = node
+        if rng.random() < 0.1:
+            r, c = path[-1]
+            neighbors = maze.getNeighbors(r, c)
+            if neighbors:
+                path += [rng.choice(neighbors), (r, c)]
+    if rng.random() < 0.1:
+        r, c = path[-1]
+        neighbors = maze.getNeighbors(r, c)
+        if neighbors:
+            path.append(rng.choice(neighbors))
+    return path
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rng = random.Random(SEED)
+        self.enabled = cache.ENABLED
+        cache.ENABLED = False
+
+    def tearDown(self):
+        cache.ENABLED = self.enabled
+        shutil.rmtree(self.directory)
+
+    def solvable_mazes(self, count, rows, cols, walls, objectives):
+        # Yields the file names of random mazes whose objectives can all be reached,
+        # with the length of their bfs path
+        made = 0
+        while made < count:
+            filename = write_maze(self.directory, "maze%d.txt" % made, rows, cols, walls, objectives, self.rng)
+            maze = Maze(filename)
+            path = search(maze, "bfs")
+            if maze.isValidPath(path) != "Valid":
+                continue
+            made += 1
+            yield filename, len(path)
+
+    def test_single_objective_methods_match_bfs(self):
+        for filename, length in self.solvable_mazes(150, 15, 25, 0.25, 1):
+            for method in SINGLE_METHODS:
+                maze = Maze(filename)
+                path = search(maze, method)
+                self.assertEqual(maze.isValidPath(path), "Valid", (filename, method))
+                self.assertEqual(len(path), length, (open(filename).read(), method))
+
+    def test_unreachable_objective_gives_empty_path(self):
+        filename = os.path.join(self.directory, "walled.txt")
+        with open(filename, 'w') as f:
+            f.write("%%%%%%%\n%P % .%\n%%%%%%%\n")
+        for method in ("bibfs", "jps", "corridor", "wavefront"):
+            self.assertEqual(search(Maze(filename), method), [], method)
+
+    def test_multi_objective_methods_match_bfs(self):
+        for filename, length in self.solvable_mazes(40, 8, 12, 0.2, 4):
+            for method in MULTI_METHODS:
+                maze = Maze(filename)
+                path = search(maze, method)
+                self.assertEqual(maze.isValidPath(path), "Valid", (filename, method))
+                self.assertEqual(len(path), length, (open(filename).read(), method))
+            maze = Maze(filename)
+            path = search(maze, "fast")
+            self.assertEqual(maze.isValidPath(path), "Valid", filename)
+            self.assertGreaterEqual(len(path), length, filename)
+
+    def test_held_karp_refuses_too_many_objectives(self):
+        count = search_module.HELD_KARP_MAX_OBJECTIVES + 1
+        filename = write_maze(self.directory, "dots.txt", 8, 12, 0.0, count, self.rng)
+        with self.assertRaises(ValueError):
+            search(Maze(filename), "held_karp")
+
+    def test_distance_table_matches_bfs_fields(self):
+        batch = wavefront.BATCH_CELLS
+        try:
+            for k in range(10):
+                filename = write_maze(self.directory, "table%d.txt" % k, 12, 16, 0.25, 6, self.rng)
+                maze = Maze(filename)
+                # batches of three fields, so that the rows come from several batches
+                wavefront.BATCH_CELLS = 3 * 14 * 18
+                table = DistanceTable(maze, workers=1)
+                adjacency = maze.getCellNeighborTable()
+                for i, source in enumerate(table.cells):
+                    field = bfs_field(adjacency, source)
+                    self.assertEqual(table.matrix[i], [field[cell] for cell in table.cells], filename)
+                    for j in range(len(table.cells)):
+                        path = table.path(j, i)
+                        if field[table.cells[j]] < 0:
+                            self.assertIsNone(path)
+                        else:
+                            self.assertEqual(len(path) - 1, field[table.cells[j]], filename)
+        finally:
+            wavefront.BATCH_CELLS = batch
+
+    def test_valid_path_array_matches_loop(self):
+        threshold = maze_module.VECTORIZE_MIN_PATH
+        try:
+            for k in range(30):
+                filename = write_maze(self.directory, "walk%d.txt" % k, 10, 14, 0.2, 3, self.rng)
+                maze = Maze(filename)
+                table = DistanceTable(maze, workers=1)
+                walks = [random_walk(maze, self.rng, self.rng.randint(0, 80), self.rng.choice((0, 0.01, 0.06)))
+                         for _ in range(50)]
+                if all(table.distance(0, node) >= 0 for node in range(1, len(table.nodes))):
+                    walks += [random_tour(maze, table, self.rng) for _ in range(50)]
+                walks += [search(Maze(filename), "astar_multi"), search(Maze(filename), "fast")]
+                for path in walks:
+                    maze_module.VECTORIZE_MIN_PATH = 1 << 30
+                    loop = maze.isValidPath(path)
+                    maze_module.VECTORIZE_MIN_PATH = 1
+                    self.assertEqual(maze.isValidPath(path), loop, (filename, path))
+        finally:
+            maze_module.VECTORIZE_MIN_PATH = threshold
+
+class SearchIterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.enabled = cache.ENABLED
+        cache.ENABLED = False
+        rng = random.Random(SEED)
+        self.filename = write_maze(self.directory, "maze.txt", 12, 16, 0.0, 3, rng)
+
+    def tearDown(self):
+        cache.ENABLED = self.enabled
+        shutil.rmtree(self.directory)
+
+    def result(self, method, **limits):
+        events = list(search_iter(Maze(self.filename), method, **limits))
+        self.assertIsInstance(events[-1], SearchResult)
+        self.assertFalse(any(isinstance(event, SearchResult) for event in events[:-1]))
+        return events[-1]
+
+    def test_done_matches_search(self):
+        for method in SEARCH_STEPS:
+            result = self.result(method)
+            self.assertEqual(result.status, "done", method)
+            self.assertEqual(result.path, search(Maze(self.filename), method), method)
+
+    def test_budget(self):
+        result = self.result("astar_multi", max_expansions=5)
+        self.assertEqual((result.path, result.status, result.expanded), (None, "budget", 5))
+
+    def test_deadline(self):
+        result = self.result("bfs", deadline=time.monotonic() - 1)
+        self.assertEqual((result.path, result.status, result.expanded), (None, "deadline", 1))
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        events = search_iter(Maze(self.filename), "astar", cancel=cancel)
+        next(events)
+        cancel.set()
+        result = list(events)[-1]
+        self.assertEqual((result.path, result.status, result.expanded), (None, "cancelled", 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# test_service.py
+# ---------------
+"""
+This file contains the tests of the solver service in service.py. Each test
+runs a service on a Unix socket in a temporary directory and talks to it with
+service.request from threads. Every request must get an answer: bad requests,
+solves that run past the timeout and workers that are killed while solving
+included, and the service must keep serving afterwards. Stopping the service
+must not wait for a solve in progress. Run with:
+
+    python -m pytest test_service.py
+"""
+
+import os
+import time
+import shutil
+import signal
+import socket
+import asyncio
+import tempfile
+import unittest
+
+import service
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+QUICK = os.path.join(MAPS, "single", "mediumMaze.txt")
+# bfs takes seconds on this maze
+SLOW = os.path.join(MAPS, "multi", "mediumSearch.txt")
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket = os.path.join(self.directory, "solver.sock")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_service(self, scenario, workers=1, timeout=None):
+        # Runs scenario(service, ask) next to a serving SolverService, where ask sends
+        # one request from a thread, then stops the service and returns how long the
+        # stop took
+        async def main():
+            solver = service.SolverService(workers, timeout)
+            serving = asyncio.ensure_future(solver.serve(self.socket))
+            while not os.path.exists(self.socket):
+                await asyncio.sleep(0.01)
+            loop = asyncio.get_running_loop()
+            def ask(payload):
+                return loop.run_in_executor(None, service.request, payload, self.socket)
+            try:
+                await scenario(solver, ask)
+            finally:
+                t = time.monotonic()
+                serving.cancel()
+                try:
+                    await serving
+                except asyncio.CancelledError:
+                    pass
+                self.stopped = time.monotonic() - t
+            self.assertFalse(os.path.exists(self.socket))
+            for worker in solver.workers:
+                self.assertFalse(worker.process.is_alive())
+        asyncio.run(main())
+
+    def test_solves_and_caches(self):
+        async def scenario(solver, ask):
+            first = await ask({"maze": QUICK, "method": "astar", "id": 7})
+            self.assertEqual((first["status"], first["verdict"], first["id"], first["cached"]), ("ok", "Valid", 7, False))
+            second = await ask({"maze": QUICK, "method": "astar", "path": False})
+            self.assertTrue(second["cached"])
+            self.assertNotIn("path", second)
+            self.assertEqual(second["path_length"], first["path_length"])
+            stats = await ask({"op": "stats"})
+            self.assertEqual((stats["requests"], stats["results"]["hits"]), (2, 1))
+        self.run_service(scenario)
+
+    def test_bad_requests_are_answered(self):
+        async def scenario(solver, ask):
+            loop = asyncio.get_running_loop()
+            def raw(line):
+                with socket.socket(socket.AF_UNIX) as sock, sock.makefile("rwb") as f:
+                    sock.connect(self.socket)
+                    f.write(line)
+                    f.flush()
+                    return f.readline()
+            self.assertIn(b"bad request", await loop.run_in_executor(None, raw, b"{not json\n"))
+            self.assertIn(b"bad request", await loop.run_in_executor(None, raw, b"[1, 2]\n"))
+            answer = await ask({"maze": QUICK, "method": "nope"})
+            self.assertEqual((answer["status"], answer["error"]), ("error", "unknown method"))
+            answer = await ask({"maze": os.path.join(self.directory, "missing.txt")})
+            self.assertEqual(answer["status"], "error")
+            answer = await ask({"maze": os.path.join(MAPS, "multi", "bigSearch.txt"), "method": "held_karp"})
+            self.assertEqual(answer["status"], "error")
+            self.assertIn("ValueError", answer["error"])
+        self.run_service(scenario)
+
+    def test_timeout_replaces_worker(self):
+        async def scenario(solver, ask):
+            stuck = solver.workers[0].process
+            answer = await ask({"maze": SLOW, "method": "bfs"})
+            self.assertEqual(answer["status"], "timeout")
+            self.assertFalse(stuck.is_alive())
+            self.assertEqual((await ask({"maze": QUICK, "method": "bfs"}))["status"], "ok")
+            stats = await ask({"op": "stats"})
+            self.assertEqual((stats["timeouts"], stats["workers_replaced"]), (1, 1))
+        self.run_service(scenario, timeout=0.5)
+
+    def test_killed_worker_is_replaced(self):
+        async def scenario(solver, ask):
+            pending = ask({"maze": SLOW, "method": "bfs"})
+            await asyncio.sleep(0.5)
+            os.kill(solver.workers[0].process.pid, signal.SIGKILL)
+            answer = await pending
+            self.assertEqual(answer["status"], "error")
+            self.assertIn("worker exited", answer["error"])
+            self.assertEqual((await ask({"maze": QUICK, "method": "bfs"}))["status"], "ok")
+        self.run_service(scenario)
+
+    def test_stop_does_not_wait_for_solves(self):
+        async def scenario(solver, ask):
+            asyncio.ensure_future(ask({"maze": SLOW, "method": "bfs"}))
+            await asyncio.sleep(0.5)
+        self.run_service(scenario)
+        self.assertLess(self.stopped, 1.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# tour.py
+# ---------------
+"""
+This file contains the tour construction and improvement used by the fast
+method. A tour is a list of node indices into a distance matrix, starting at
+node 0 (the maze start) and visiting every other node once. It is an open
+path: there is no edge back to the start.
+"""
+
+from operator import add
+
+def tour_cost(tour, matrix):
+    return sum(matrix[tour[k]][tour[k + 1]] for k in range(len(tour) - 1))
+
+def nearest_neighbor_tour(matrix):
+    """
+    @param matrix: a square distance matrix, negative entries meaning unreachable
+
+    @return tour: node 0 followed by the nodes reachable from it, each time going to
+        the closest node not visited yet
+    """
+    left = set(k for k in range(1, len(matrix)) if matrix[0][k] >= 0)
+    tour = [0]
+    while left:
+        row = matrix[tour[-1]]
+        nearest = min(left, key=row.__getitem__)
+        tour.append(nearest)
+        left.remove(nearest)
+    return tour
+
+def two_opt(tour, matrix, max_moves=None):
+    """
+    Reverses tour segments while that makes the tour shorter, at most max_moves
+    times (None for no limit). The first node stays in place. Modifies tour.
+
+    @return moves: the number of segments reversed
+    """
+    n = len(tour)
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            row_a = matrix[tour[i - 1]]
+            for j in range(i + 1, n):
+                ti, tj = tour[i], tour[j]
+                delta = row_a[tj] - row_a[ti]
+                if j + 1 < n:
+                    b = tour[j + 1]
+                    delta += matrix[ti][b] - matrix[tj][b]
+                if delta < 0:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    improved = True
+                    moves += 1
+                    if moves == max_moves:
+                        return moves
+    return moves
+
+def or_opt(tour, matrix, max_moves=None):
+    """
+    Moves segments of one to three nodes, possibly reversed, to the position where
+    they make the tour shortest, at most max_moves times (None for no limit). The
+    first node stays in place. Modifies tour. The matrix must be symmetric.
+
+    @return moves: the number of segments moved
+    """
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for length in (1, 2, 3):
+            i = 1
+            while i + length <= len(tour):
+                n = len(tour)
+                end = i + length
+                first, last = tour[i], tour[end - 1]
+                to_first, to_last = matrix[first], matrix[last]
+                gain = to_first[tour[i - 1]]
+                if end < n:
+                    gain += to_last[tour[end]] - matrix[tour[i - 1]][tour[end]]
+                best, best_k, best_rev = 0, None, False
+                # insert between tour[k] and tour[k + 1], for edges not touching the segment
+                for k in range(n - 1):
+                    if i - 1 <= k < end:
+                        continue
+                    x, y = tour[k], tour[k + 1]
+                    dxy = matrix[x][y]
+                    if gain - (to_first[x] + to_last[y] - dxy) > best:
+                        best, best_k, best_rev = gain - (to_first[x] + to_last[y] - dxy), k, False
+                    if gain - (to_last[x] + to_first[y] - dxy) > best:
+                        best, best_k, best_rev = gain - (to_last[x] + to_first[y] - dxy), k, True
+                # or append it after the last node
+                if end < n:
+                    x = tour[-1]
+                    if gain - to_first[x] > best:
+                        best, best_k, best_rev = gain - to_first[x], n - 1, False
+                    if gain - to_last[x] > best:
+                        best, best_k, best_rev = gain - to_last[x], n - 1, True
+                if best_k is not None:
+                    segment = tour[i:end]
+                    if best_rev:
+                        segment.reverse()
+                    if best_k < i:
+                        tour[:] = tour[:best_k + 1] + segment + tour[best_k + 1:i] + tour[end:]
+                    else:
+                        tour[:] = tour[:i] + tour[end:best_k + 1] + segment + tour[best_k + 1:]
+                    improved = True
+                    moves += 1
+                    if moves == max_moves:
+                        return moves
+                i += 1
+    return moves
+
+def improve_tour(tour, matrix, max_moves=None):
+    """
+    Alternates 2-opt and Or-opt until neither shortens the tour or they have made
+    max_moves moves together (None for no limit). The result depends only on the
+    matrix, never on timing. Modifies tour.
+    """
+    left = max_moves
+    while True:
+        moves = two_opt(tour, matrix, left)
+        if left is not None:
+            left -= moves
+            if left == 0:
+                break
+        more = or_opt(tour, matrix, left)
+        if left is not None:
+            left -= more
+            if left == 0:
+                break
+        if not moves + more:
+            break
+    return tour
+
+def held_karp_tour(matrix):
+    """
+    Finds a shortest tour with the Held-Karp dynamic program, in O(2^n n^2) time for
+    the n nodes reachable from node 0.
+
+    @param matrix: a square symmetric distance matrix, negative entries meaning unreachable
+
+    @return tour: an optimal tour over node 0 and the nodes reachable from it
+    """
+    nodes = [k for k in range(1, len(matrix)) if matrix[0][k] >= 0]
+    n = len(nodes)
+    if n == 0:
+        return [0]
+    dist = [[matrix[a][b] for b in nodes] for a in nodes]
+    inf = float("inf")
+    # cost[mask][j]: length of the shortest path from node 0 through the nodes of mask,
+    # ending at nodes[j]; inf where j is not in mask
+    cost = [None] * (1 << n)
+    cost[0] = [inf] * n
+    for mask in range(1, 1 << n):
+        row = [inf] * n
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            j = bit.bit_length() - 1
+            prev = mask ^ bit
+            if prev:
+                row[j] = min(map(add, cost[prev], dist[j]))
+            else:
+                row[j] = matrix[0][nodes[j]]
+        cost[mask] = row
+
+    # walk the table back from the cheapest end
+    mask = (1 << n) - 1
+    j = min(range(n), key=cost[mask].__getitem__)
+    order = []
+    while True:
+        order.append(nodes[j])
+        prev = mask ^ (1 << j)
+        if not prev:
+            break
+        target = cost[mask][j]
+        j = next(i for i in range(n) if cost[prev][i] + dist[i][j] == target)
+        mask = prev
+    order.append(0)
+    return order[::-1]
@@ -0,0 +1,165 @@
+# wavefront.py
+# ---------------
+"""
+This file contains the vectorized distance-field engine. The maze's wall mask
+is loaded into a NumPy boolean grid, and the BFS distance from one or many
+sources to every cell is computed one whole wavefront at a time: each step
+shifts the frontier by the four move offsets and masks out walls and cells
+already reached. Paths are read back by descending the distance gradient.
+
+NumPy is optional. Without it, available is False and callers fall back to
+the per-cell BFS in distance.py. It is imported by open_grid, which every
+computation here starts from, so that importing this module, as search.py
+does, costs nothing for the searches that never use it.
+"""
+
+import importlib.util
+
+# Bound by open_grid on first use
+np = None
+
+available = importlib.util.find_spec("numpy") is not None
+
+UNREACHABLE = -1
+
+# Most sources * cells computed in one batch, bounding the working memory of
+# field_batches to about 70 MB; larger batches are no faster on big mazes
+BATCH_CELLS = 1 << 22
+
+# Returns the open cells of the maze as a boolean grid with a ring of walls around
+# it, so that the four move offsets never leave the array
+def open_grid(maze):
+    global np
+    if np is None:
+        import numpy as np
+    rows, cols = maze.getDimensions()
+    grid = np.zeros((rows + 2, cols + 2), dtype=bool)
+    walls = np.frombuffer(bytes(maze.walls), dtype=np.uint8).reshape(rows, cols)
+    grid[1:-1, 1:-1] = walls == 0
+    return grid
+
+def field_batches(grid, sources):
+    """
+    Computes the BFS distance fields of the sources, as many at once as fit in
+    BATCH_CELLS. The frontier is kept as flat indices into the stacked fields, so a
+    step only costs as much as the wavefront it moves rather than the whole grid.
+    Only one batch is held at a time, so callers that reduce each batch (e.g. to the
+    distances between objectives) never hold every field.
+
+    @param grid: a padded grid from open_grid
+    @param sources: (row, col) positions
+
+    @return batches: a generator of int32 arrays of shape (k, rows, cols), the fields
+        of the next k sources in order, with the distance to each cell and
+        UNREACHABLE for walls and cells that cannot be reached
+    """
+    rows, cols = grid.shape[0] - 2, grid.shape[1] - 2
+    width = grid.shape[1]
+    size = grid.size
+    batch = max(1, BATCH_CELLS // size)
+    offsets = np.array([width, -width, 1, -1])
+    for lo in range(0, len(sources), batch):
+        chunk = sources[lo:lo + batch]
+        field = np.full(len(chunk) * size, UNREACHABLE, dtype=np.int32)
+        unseen = np.tile(grid.ravel(), len(chunk))
+        # slot[i] == k marks index i as the k-th entry of the new frontier, so that
+        # duplicates can be dropped without sorting
+        slot = np.empty(field.size, dtype=np.int64)
+        frontier = np.array([k * size + (r + 1) * width + c + 1 for k, (r, c) in enumerate(chunk)], dtype=np.int64)
+        for _ in _spread(field, unseen, slot, frontier, offsets):
+            pass
+        del unseen, slot
+        yield field.reshape(len(chunk), rows + 2, cols + 2)[:, 1:-1, 1:-1]
+
+def distance_fields(grid, sources):
+    """
+    Computes the BFS distance field of every source, see field_batches.
+
+    @return fields: an int32 array of shape (len(sources), rows, cols)
+    """
+    return np.concatenate(list(field_batches(grid, sources)))
+
+def _spread(field, unseen, slot, frontier, offsets):
+    # Moves the wavefront out from the open cells of frontier one step at a time,
+    # writing the distance of every cell it reaches to field; yields the distance and
+    # the new frontier after each step
+    frontier = frontier[unseen[frontier]]
+    field[frontier] = 0
+    unseen[frontier] = False
+    d = 0
+    while frontier.size:
+        d += 1
+        reached = (frontier[:, None] + offsets).ravel()
+        reached = reached[unseen[reached]]
+        order = np.arange(reached.size)
+        slot[reached] = order
+        reached = reached[slot[reached] == order]
+        unseen[reached] = False
+        field[reached] = d
+        frontier = reached
+        yield d, frontier
+
+def field_steps(grid, source, target=None):
+    """
+    Computes the distance field of a single source like distance_field, one wavefront
+    at a time, and stops as soon as target is reached.
+
+    @param grid: a padded grid from open_grid
+    @param source: the (row, col) to measure from
+    @param target: a (row, col) whose distance is all that is needed, or None for the
+        whole field
+
+    @return steps: a generator yielding (cell, size, distance) for every wavefront, with
+        the flat r * cols + c index of one of its cells, and returning the raveled
+        field; cells past the target's distance are UNREACHABLE
+    """
+    width = grid.shape[1]
+    cols = width - 2
+    field = np.full(grid.size, UNREACHABLE, dtype=np.int32)
+    unseen = grid.ravel().copy()
+    slot = np.empty(grid.size, dtype=np.int64)
+    goal = None if target is None else (target[0] + 1) * width + target[1] + 1
+    frontier = np.array([(source[0] + 1) * width + source[1] + 1], dtype=np.int64)
+    offsets = np.array([width, -width, 1, -1])
+    for d, frontier in _spread(field, unseen, slot, frontier, offsets):
+        if not frontier.size or (goal is not None and field[goal] != UNREACHABLE):
+            break
+        r, c = divmod(int(frontier[0]), width)
+        yield (r - 1) * cols + c - 1, frontier.size, d
+    return field.reshape(grid.shape)[1:-1, 1:-1].ravel()
+
+# Returns the raveled BFS distance field of a single source, see field_steps; with a
+# target, only the cells closer to source than target are filled in
+def distance_field(grid, source, target=None):
+    steps = field_steps(grid, source, target)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+def descend(field, cell, cols):
+    """
+    Walks down a distance field to its source.
+
+    @param field: a flat sequence of distances indexed by r * cols + c, e.g. a
+        distance_field or a distance.bfs_field
+    @param cell: the flat index to start from
+
+    @return path: the (row, col) tuples from cell to the source, or None if the
+        source cannot be reached from cell
+    """
+    if field[cell] == UNREACHABLE:
+        return None
+    size = len(field)
+    path = [divmod(cell, cols)]
+    # any in-bounds open neighbor one step closer to the source is a valid next step
+    while field[cell] > 0:
+        d = field[cell] - 1
+        r, c = divmod(cell, cols)
+        for n in (cell + cols, cell - cols, cell + 1, cell - 1):
+            if 0 <= n < size and field[n] == d and abs(n % cols - c) + abs(n // cols - r) == 1:
+                cell = n
+                break
+        path.append(divmod(cell, cols))
+    return path